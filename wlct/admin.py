@@ -167,7 +167,19 @@ class PromotionalRelegationLeagueSeasonAdmin(admin.ModelAdmin):
 admin.site.register(PromotionalRelegationLeagueSeason, PromotionalRelegationLeagueSeasonAdmin)
 
 class ClanLeagueAdmin(admin.ModelAdmin):
-    pass
+    actions = ['rebuild_standings', 'rebuild_game_log']
+
+    def rebuild_standings(self, request, queryset):
+        for league in queryset:
+            league.rebuild_standings()
+        self.message_user(request, "Rebuilt standings for {} clan league(s).".format(queryset.count()))
+    rebuild_standings.short_description = "Rebuild clan standings from finished games"
+
+    def rebuild_game_log(self, request, queryset):
+        for league in queryset:
+            league.rebuild_game_log()
+        self.message_user(request, "Rebuilt the game log for {} clan league(s).".format(queryset.count()))
+    rebuild_game_log.short_description = "Rebuild the game log from every game"
 
 admin.site.register(ClanLeague, ClanLeagueAdmin)
 
@@ -0,0 +1,358 @@
+# read-only json api, version 1
+# every response is built once per version of the tournament it belongs to and kept in the shared cache, so
+# the bot, other community tools and the site's own pages can all poll it without touching the database.
+# lists are paged with an opaque cursor and any object can be cut down with ?fields=a,b
+
+import hashlib
+import json
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from wlct.logging import log_exception
+from wlct.models import Player
+from wlct.tournaments import Tournament, TournamentRound, TournamentTeam, TournamentGame, TournamentPlayer, RoundRobinTournament, MonthlyTemplateRotation, RealTimeLadder, ClanLeague, ClanLeagueDivisionClan, find_tournament_by_id, get_tournament_version, get_player_game_entries, get_tournament_type, get_tournaments_with_types
+
+default_page_size = 50
+max_page_size = 200
+
+# responses that don't belong to a tournament have no version, they are kept for this long instead
+unversioned_max_age = 60
+
+# versioned responses are still rebuilt after this long, for the few fields (like the state of a game in
+# progress) that change without the tournament's version moving
+versioned_timeout = 300
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super(ApiError, self).__init__(message)
+        self.status = status
+
+
+def get_player_object(player):
+    return {'token': player.token, 'name': player.name, 'clan': player.clan.name if player.clan is not None else None}
+
+def get_tournament_object(tournament):
+    return {
+        'id': tournament.id,
+        'name': tournament.name,
+        'type': get_tournament_type(tournament),
+        'description': tournament.description,
+        'created_by': {'token': tournament.created_by.token, 'name': tournament.created_by.name},
+        'created_date': tournament.created_date,
+        'has_started': tournament.has_started,
+        'is_finished': tournament.is_finished,
+        'is_league': bool(tournament.is_league),
+        'is_official': tournament.is_official,
+        'private': tournament.private,
+        'template': tournament.template,
+        'multi_day': tournament.multi_day,
+        'players_per_team': tournament.players_per_team,
+        'teams_per_game': tournament.teams_per_game,
+        'number_players': tournament.number_players,
+        'max_players': tournament.max_players,
+        'number_rounds': tournament.number_rounds,
+        'winning_team': tournament.winning_team_id,
+    }
+
+def get_round_object(tournament_round):
+    return {
+        'id': tournament_round.id,
+        'tournament': tournament_round.tournament_id,
+        'round_number': tournament_round.round_number,
+        'number_games': tournament_round.number_games,
+        'is_finished': tournament_round.is_finished,
+    }
+
+def get_game_object(game):
+    return {
+        'id': game.id,
+        'tournament': game.tournament_id,
+        'round': game.round.round_number,
+        'teams': [int(team) for team in game.teams.split('.')] if game.teams else [],
+        'gameid': game.gameid,
+        'game_link': game.game_link,
+        'current_state': game.current_state,
+        'is_finished': game.is_finished,
+        'winning_team': game.winning_team_id,
+        'game_start_time': game.game_start_time,
+        'game_finished_time': game.game_finished_time,
+    }
+
+def get_team_object(team, team_players):
+    return {
+        'id': team.id,
+        'tournament': team.tournament_id,
+        'players': [get_player_object(tournament_player.player) for tournament_player in team_players[team.id]],
+        'wins': team.wins,
+        'losses': team.losses,
+        'rating': team.rating,
+        'seed': team.seed,
+        'place': team.place,
+        'active': team.active,
+    }
+
+def get_team_players_for(team_ids):
+    team_players = {team_id: [] for team_id in team_ids}
+    for tournament_player in TournamentPlayer.objects.filter(team_id__in=team_ids).select_related('player__clan').order_by('id'):
+        team_players[tournament_player.team_id].append(tournament_player)
+    return team_players
+
+def get_int_parameter(request, name, default=None):
+    value = request.GET.get(name, None)
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiError(400, "{} must be a number".format(name))
+
+def get_bool_parameter(request, name):
+    value = request.GET.get(name, None)
+    if value is None or value == "":
+        return None
+    if value in ['true', '1']:
+        return True
+    if value in ['false', '0']:
+        return False
+    raise ApiError(400, "{} must be true or false".format(name))
+
+def get_page_size(request):
+    page_size = get_int_parameter(request, 'limit', default_page_size)
+    if page_size < 1 or page_size > max_page_size:
+        raise ApiError(400, "limit must be between 1 and {}".format(max_page_size))
+    return page_size
+
+def get_keyset_page(request, queryset, descending=False):
+    # the cursor is the id the last page ended on, so a page costs the same however deep it is and
+    # rows added while paging never shift the pages already read
+    page_size = get_page_size(request)
+    cursor = get_int_parameter(request, 'cursor')
+    if descending:
+        queryset = queryset.order_by('-id')
+        if cursor is not None:
+            queryset = queryset.filter(id__lt=cursor)
+    else:
+        queryset = queryset.order_by('id')
+        if cursor is not None:
+            queryset = queryset.filter(id__gt=cursor)
+    items = list(queryset[:page_size + 1])
+    next_cursor = str(items[page_size - 1].id) if len(items) > page_size else None
+    return items[:page_size], next_cursor
+
+def get_list_page(request, items):
+    # rankings and standings are ordered by points rather than id and are only ever a few hundred rows
+    # built in one go, so their cursor is just the position the last page ended on
+    page_size = get_page_size(request)
+    cursor = get_int_parameter(request, 'cursor', 0)
+    if cursor < 0:
+        raise ApiError(400, "cursor must not be negative")
+    next_cursor = str(cursor + page_size) if len(items) > cursor + page_size else None
+    return items[cursor:cursor + page_size], next_cursor
+
+def select_fields(request, data):
+    fields = request.GET.get('fields', None)
+    if not fields:
+        return data
+    fields = fields.split(',')
+    if isinstance(data, list):
+        return [{field: item[field] for field in fields if field in item} for item in data]
+    return {field: data[field] for field in fields if field in data}
+
+def get_response(request, build, tournament_id=None):
+    # requests for a tournament are keyed by its version, so the etag can be checked and the body found
+    # without building anything. everything else is kept for a minute and tagged by what's in it
+    try:
+        if tournament_id is not None:
+            key = hashlib.md5("{}:{}".format(get_tournament_version(tournament_id), request.get_full_path()).encode()).hexdigest()
+            etag = '"{}"'.format(key)
+            if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                return response
+            timeout = versioned_timeout
+            max_age = 0
+        else:
+            key = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            timeout = unversioned_max_age
+            max_age = unversioned_max_age
+
+        body = cache.get("api_v1:{}".format(key))
+        if body is None:
+            body = json.dumps(build(), cls=DjangoJSONEncoder)
+            cache.set("api_v1:{}".format(key), body, timeout)
+
+        if tournament_id is None:
+            etag = '"{}"'.format(hashlib.md5(body.encode()).hexdigest())
+            if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                return response
+
+        response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        # versioned responses can always be revalidated cheaply, so clients check every time
+        response['Cache-Control'] = 'public, max-age={}'.format(max_age)
+        return response
+    except ApiError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    except Exception as e:
+        log_exception()
+        return JsonResponse({'error': str(e)}, status=500)
+
+def get_tournament_or_error(id):
+    tournament = get_tournaments_with_types().filter(pk=id).first()
+    if tournament is None:
+        raise ApiError(404, "Tournament {} does not exist".format(id))
+    return tournament
+
+def get_child_tournament_or_error(id):
+    tournament = find_tournament_by_id(id, True)
+    if not tournament:
+        raise ApiError(404, "Tournament {} does not exist".format(id))
+    return tournament[0]
+
+def check_method(request):
+    if request.method != 'GET':
+        return JsonResponse({'error': "Only GET requests are supported"}, status=405)
+    return None
+
+
+def tournaments(request):
+    # public tournaments and leagues, newest first
+    def build():
+        queryset = get_tournaments_with_types().filter(private=False)
+        is_finished = get_bool_parameter(request, 'finished')
+        if is_finished is not None:
+            queryset = queryset.filter(is_finished=is_finished)
+        has_started = get_bool_parameter(request, 'started')
+        if has_started is not None:
+            queryset = queryset.filter(has_started=has_started)
+        is_league = get_bool_parameter(request, 'league')
+        if is_league is not None:
+            queryset = queryset.filter(is_league=is_league)
+        items, next_cursor = get_keyset_page(request, queryset, True)
+        return {'data': select_fields(request, [get_tournament_object(tournament) for tournament in items]), 'next_cursor': next_cursor}
+
+    return check_method(request) or get_response(request, build)
+
+def tournament(request, id):
+    def build():
+        return {'data': select_fields(request, get_tournament_object(get_tournament_or_error(id)))}
+
+    return check_method(request) or get_response(request, build, id)
+
+def tournament_rounds(request, id):
+    def build():
+        get_tournament_or_error(id)
+        rounds = TournamentRound.objects.filter(tournament_id=id).order_by('round_number', 'id')
+        return {'data': select_fields(request, [get_round_object(tournament_round) for tournament_round in rounds])}
+
+    return check_method(request) or get_response(request, build, id)
+
+def tournament_games(request, id):
+    # the games of a tournament and of the round robins it runs (group stages and clan leagues), newest first
+    def build():
+        get_tournament_or_error(id)
+        tournament_ids = [id] + list(RoundRobinTournament.objects.filter(parent_tournament_id=id).values_list('id', flat=True))
+        queryset = TournamentGame.objects.filter(tournament_id__in=tournament_ids).select_related('round')
+        is_finished = get_bool_parameter(request, 'finished')
+        if is_finished is not None:
+            queryset = queryset.filter(is_finished=is_finished)
+        round_number = get_int_parameter(request, 'round')
+        if round_number is not None:
+            queryset = queryset.filter(round__round_number=round_number)
+        items, next_cursor = get_keyset_page(request, queryset, True)
+        return {'data': select_fields(request, [get_game_object(game) for game in items]), 'next_cursor': next_cursor}
+
+    return check_method(request) or get_response(request, build, id)
+
+def tournament_teams(request, id):
+    def build():
+        get_tournament_or_error(id)
+        queryset = TournamentTeam.objects.filter(tournament_id=id)
+        active = get_bool_parameter(request, 'active')
+        if active is not None:
+            queryset = queryset.filter(active=active)
+        items, next_cursor = get_keyset_page(request, queryset)
+        team_players = get_team_players_for([team.id for team in items])
+        return {'data': select_fields(request, [get_team_object(team, team_players) for team in items]), 'next_cursor': next_cursor}
+
+    return check_method(request) or get_response(request, build, id)
+
+def tournament_standings(request, id):
+    # clan leagues are standings of clans per division, everything else is its teams by record
+    def build():
+        tournament = get_child_tournament_or_error(id)
+        if isinstance(tournament, ClanLeague):
+            standings = []
+            division_places = {}
+            for division_clan in ClanLeagueDivisionClan.objects.filter(division__league=tournament).select_related('division', 'clan').order_by('division__title', 'division_id', '-total_points', '-max_points_possible', 'id'):
+                division_places[division_clan.division_id] = division_places.get(division_clan.division_id, 0) + 1
+                standings.append({'division': division_clan.division.title, 'place': division_places[division_clan.division_id], 'clan': division_clan.clan.name if division_clan.clan is not None else None, 'total_points': division_clan.total_points, 'max_points_possible': division_clan.max_points_possible})
+        else:
+            teams = list(TournamentTeam.objects.filter(tournament=tournament).order_by('-wins', 'losses', '-rating', 'id'))
+            team_players = get_team_players_for([team.id for team in teams])
+            standings = []
+            for place, team in enumerate(teams, 1):
+                standing = get_team_object(team, team_players)
+                standing['place'] = place
+                standings.append(standing)
+        items, next_cursor = get_list_page(request, standings)
+        return {'data': select_fields(request, items), 'next_cursor': next_cursor}
+
+    return check_method(request) or get_response(request, build, id)
+
+def ladder_rankings(request, id):
+    # the monthly template circuit ranks from the leaderboard the engine keeps, the real-time ladder by rating
+    def build():
+        ladder = get_child_tournament_or_error(id)
+        rankings = []
+        if isinstance(ladder, MonthlyTemplateRotation):
+            ranked = []
+            unranked = []
+            for team in ladder.get_leaderboard():
+                ranking = {'team': team['team'], 'rank': None, 'rating': team['rating'], 'games_finished': team['games_finished'], 'players': [{'token': team['token'], 'name': team['name'], 'clan': team['clan']['name'] if team['clan'] is not None else None}]}
+                if team['games_finished'] >= ladder.ranked_games_required:
+                    ranking['rank'] = len(ranked) + 1
+                    ranked.append(ranking)
+                else:
+                    unranked.append(ranking)
+            rankings = ranked + unranked
+        elif isinstance(ladder, RealTimeLadder):
+            teams = list(TournamentTeam.objects.filter(tournament=ladder).order_by('-rating', 'id'))
+            team_players = get_team_players_for([team.id for team in teams])
+            for rank, team in enumerate(teams, 1):
+                rankings.append({'team': team.id, 'rank': rank, 'rating': team.rating, 'wins': team.wins, 'losses': team.losses, 'active': team.active, 'players': [get_player_object(tournament_player.player) for tournament_player in team_players[team.id]]})
+        else:
+            raise ApiError(404, "Tournament {} is not a ladder".format(id))
+        items, next_cursor = get_list_page(request, rankings)
+        return {'data': select_fields(request, items), 'next_cursor': next_cursor}
+
+    return check_method(request) or get_response(request, build, id)
+
+def player_games(request, token):
+    # every game the player has played in any tournament, newest first
+    def build():
+        player = Player.objects.filter(token=token).first()
+        if player is None:
+            raise ApiError(404, "Player {} does not exist".format(token))
+        status = request.GET.get('status', None)
+        if status not in [None, "", "in_progress", "won", "lost"]:
+            raise ApiError(400, "status must be in_progress, won or lost")
+        entries, next_cursor = get_keyset_page(request, get_player_game_entries(player, status or None, get_int_parameter(request, 'tournament')), True)
+        games = []
+        for entry in entries:
+            # entries can outlive their game or tournament, those fields are null then
+            tournament_name = None
+            if entry.tournament is not None:
+                tournament_name = entry.tournament.name
+            game_link, is_finished, won = None, None, None
+            if entry.game is not None:
+                game_link = entry.game.game_link
+                is_finished = entry.game.is_finished
+                if is_finished:
+                    won = entry.game.winning_team_id == entry.team_id
+            games.append({'id': entry.game_id, 'tournament': entry.tournament_id, 'tournament_name': tournament_name, 'team': entry.team_id, 'team_opp': entry.team_opp_id, 'game_link': game_link, 'is_finished': is_finished, 'won': won, 'created_date': entry.created_date})
+        return {'data': select_fields(request, games), 'next_cursor': next_cursor}
+
+    return check_method(request) or get_response(request, build)
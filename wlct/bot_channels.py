@@ -0,0 +1,75 @@
+# the channels the discord bot broadcasts to
+# channels are found by name, and each guild's are indexed once when its shard first becomes ready. after that
+# the channel and guild events keep the index current, so a reconnect doesn't rescan anything and finding the
+# channels for a purpose never walks the guilds. only ids are kept and the bot looks the channel up when it is
+# used, so nothing goes stale when discord.py rebuilds its state after a reconnect
+
+import discord
+from collections import defaultdict
+
+channel_purposes = {
+    "real-time-ladder": "rtl", "real_time_ladder": "rtl",
+    "monthly-template-circuit": "mtc", "monthly_template_circuit": "mtc",
+    "clan-league-bot-chat": "clan_league", "clan_league_bot_chat": "clan_league",
+}
+
+class ChannelRegistry():
+    def __init__(self, bot):
+        self.bot = bot
+        self.indexed_shards = set()
+        # channel ids by guild and purpose, by purpose across every guild, and the purpose of each channel
+        self.guild_channels = defaultdict(lambda: defaultdict(set))
+        self.purpose_channels = defaultdict(set)
+        self.channel_purpose = {}
+
+    def index_shard(self, shard_id):
+        if shard_id in self.indexed_shards:
+            return
+        self.indexed_shards.add(shard_id)
+        for guild in self.bot.guilds:
+            if guild.shard_id == shard_id:
+                self.add_guild(guild)
+
+    def add_guild(self, guild):
+        self.remove_guild(guild)
+        for channel in guild.channels:
+            self.add_channel(channel)
+
+    def remove_guild(self, guild):
+        for channel_ids in self.guild_channels.pop(guild.id, {}).values():
+            for channel_id in channel_ids:
+                self.forget_channel(channel_id)
+
+    def add_channel(self, channel):
+        purpose = channel_purposes.get(channel.name)
+        if purpose is not None and isinstance(channel, discord.TextChannel):
+            print("Caching {} channel in guild: {}".format(purpose, channel.guild.name))
+            self.guild_channels[channel.guild.id][purpose].add(channel.id)
+            self.purpose_channels[purpose].add(channel.id)
+            self.channel_purpose[channel.id] = purpose
+
+    def remove_channel(self, channel):
+        purpose = self.forget_channel(channel.id)
+        if purpose is not None:
+            self.guild_channels[channel.guild.id][purpose].discard(channel.id)
+
+    def update_channel(self, channel):
+        # a rename can move a channel to another purpose or out of the registry
+        self.remove_channel(channel)
+        self.add_channel(channel)
+
+    def forget_channel(self, channel_id):
+        purpose = self.channel_purpose.pop(channel_id, None)
+        if purpose is not None:
+            self.purpose_channels[purpose].discard(channel_id)
+        return purpose
+
+    def resolve(self, channel_ids):
+        channels = [self.bot.get_channel(channel_id) for channel_id in channel_ids]
+        return [channel for channel in channels if channel is not None]
+
+    def get_channels(self, purpose):
+        return self.resolve(self.purpose_channels[purpose])
+
+    def get_guild_channels(self, guild_id, purpose):
+        return self.resolve(self.guild_channels.get(guild_id, {}).get(purpose, ()))
@@ -0,0 +1,119 @@
+# database access for the discord bot
+# the orm is synchronous, so nothing in the bot queries on the event loop. every query runs on a small pool of
+# threads and the cogs await the result, so a slow query holds up one command instead of every shard's heartbeat.
+# the pool bounds how many connections the bot holds, and each piece of work closes the connection it used the
+# way a request would, so a bot that sits idle for hours never wakes up on a dead connection
+
+import asyncio
+import functools
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import close_old_connections
+from django.db.models import Count
+from wlct.models import Clan, Player, Engine
+from wlct.logging import ProcessGameLog
+from wlct.tournaments import TournamentGame, TournamentPlayer, RealTimeLadder, MonthlyTemplateRotation, get_players_data_no_clan, bump_changed_tournament_versions, get_tournaments_with_types, get_tournament_type
+
+executor = ThreadPoolExecutor(max_workers=settings.BOT_DB_THREADS, thread_name_prefix="bot_db")
+
+def call_with_connection(func, *args, **kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        bump_changed_tournament_versions()
+        close_old_connections()
+
+async def run_db(func, *args, **kwargs):
+    # runs func on the database threads, anything it returns must already be loaded since querysets
+    # that are evaluated later would query on the event loop
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(executor, functools.partial(call_with_connection, func, *args, **kwargs))
+
+
+def get_unmentioned_ladder_games():
+    # new games on every real-time ladder with the discord ids of both players, in two queries
+    games = list(TournamentGame.objects.filter(tournament__realtimeladder__isnull=False, is_finished=False, mentioned=False).order_by('id'))
+    team_ids = [int(team) for game in games for team in game.teams.split('.')]
+    discord_ids = {}
+    for tournament_player in TournamentPlayer.objects.filter(team_id__in=team_ids).select_related('player'):
+        discord_ids[tournament_player.team_id] = tournament_player.player.discord_id
+    return [{'id': game.id, 'game_link': game.game_link, 'discord_ids': [discord_ids.get(int(team)) for team in game.teams.split('.')]} for game in games]
+
+def mark_games_mentioned(game_ids):
+    TournamentGame.objects.filter(id__in=game_ids).update(mentioned=True)
+
+def get_player_by_discord_id(discord_id):
+    return Player.objects.filter(discord_id=str(discord_id)).first()
+
+def get_linked_discord_ids(discord_ids, chunk_size=500):
+    # which of these discord ids belong to a player, a chunk of ids per query
+    discord_ids = [str(discord_id) for discord_id in discord_ids]
+    linked = set()
+    for start in range(0, len(discord_ids), chunk_size):
+        linked.update(Player.objects.filter(discord_id__in=discord_ids[start:start + chunk_size]).values_list('discord_id', flat=True))
+    return linked
+
+def link_discord_account(bot_token, discord_id):
+    # returns the player the token belongs to, and whether the account was linked by this call
+    player = Player.objects.filter(bot_token=bot_token).first()
+    if player is not None and (player.discord_id == "" or player.discord_id is None):
+        player.discord_id = str(discord_id)
+        player.save()
+        return player, True
+    return player, False
+
+def get_real_time_ladders():
+    return list(RealTimeLadder.objects.all().order_by('id'))
+
+def get_monthly_template_rotation(id):
+    return MonthlyTemplateRotation.objects.filter(id=id).first()
+
+def get_clan_players(clanid):
+    clan = Clan.objects.filter(pk=clanid).first()
+    if clan is None:
+        return None, []
+    return clan, list(Player.objects.filter(clan=clan).order_by('name'))
+
+def get_clans_with_players():
+    return list(Clan.objects.filter(player__isnull=False).distinct().order_by('id'))
+
+def get_engine():
+    return Engine.objects.first()
+
+def get_game_log_messages(game_id, num_logs, page):
+    game_logs = ProcessGameLog.objects.filter(game__gameid=int(game_id)).order_by('id')
+    return [log.msg for log in Paginator(game_logs, num_logs).get_page(page)]
+
+def get_tournament_page(arg, after=None, page_size=10):
+    # one page of finished (-f) or open (-o) public tournaments, newest first, after the id the last page ended on.
+    # the filters are indexed and the types come along in the same query, so a page costs the same however
+    # many tournaments there have ever been
+    tournaments = get_tournaments_with_types().filter(private=False).exclude(dummytournament__isnull=False).exclude(promotionalrelegationleagueseason__isnull=False)
+    if arg == "-f":
+        tournaments = tournaments.filter(is_finished=True)
+    else:
+        tournaments = tournaments.filter(is_finished=False, has_started=False)
+    if after is not None:
+        tournaments = tournaments.filter(id__lt=after)
+    tournaments = list(tournaments.order_by('-id')[:page_size + 1])
+    has_more = len(tournaments) > page_size
+    tournaments = tournaments[:page_size]
+
+    if arg == "-f":
+        winners = defaultdict(list)
+        for tournament_player in TournamentPlayer.objects.filter(team_id__in=[tournament.winning_team_id for tournament in tournaments if tournament.winning_team_id]).select_related('player'):
+            winners[tournament_player.team_id].append(tournament_player)
+    else:
+        players_joined = dict(TournamentPlayer.objects.filter(tournament__in=tournaments).values_list('tournament_id').annotate(Count('id')))
+
+    rows = []
+    for tournament in tournaments:
+        if arg == "-f":
+            detail = "Winner: {}".format(get_players_data_no_clan(winners[tournament.winning_team_id]) or "None")
+        else:
+            detail = "{} spots left".format(tournament.max_players - players_joined.get(tournament.id, 0))
+        rows.append({'id': tournament.id, 'name': tournament.name, 'type': get_tournament_type(tournament).replace('_', ' ').title(), 'detail': detail})
+    return rows, has_more
@@ -0,0 +1,168 @@
+# outbound messages for the discord bot
+# notifications for the same person are gathered for a few seconds and sent as one digest, so a busy ladder
+# sends each player one message instead of one per game. every destination gets its own queue, sent from in
+# order and no faster than discord allows for a channel, with a bucket over everything for the global limit.
+# a send that fails because discord is busy or unreachable is tried again a little later, anything else is
+# given up on so one bad recipient never holds up the rest
+
+import asyncio
+import functools
+import random
+import time
+import aiohttp
+import discord
+from collections import deque
+from traceback import print_exc
+
+# how long notifications for one person are gathered before their digest goes out
+digest_delay = 10.0
+
+# an embed holds at most 25 fields, longer digests are split across messages
+digest_max_fields = 25
+
+# discord lets a bot send 5 messages per 5 seconds to a channel and 50 requests per second overall
+route_rate = (5, 5.0)
+global_rate = (50, 1.0)
+
+# failed sends are retried this many times, backing off from retry_base up to retry_max seconds
+send_attempts = 5
+retry_base = 1.0
+retry_max = 60.0
+
+def can_retry(error):
+    # discord being busy or unreachable passes, a user with dms closed or a channel we lost access to won't
+    # get any better
+    if isinstance(error, discord.HTTPException):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
+class TokenBucket():
+    def __init__(self, rate, per):
+        self.capacity = rate
+        self.per = per
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def take(self):
+        # takes a token and returns 0 if there is one, otherwise how long until there will be
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / self.per)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) * self.per / self.capacity
+
+    async def acquire(self):
+        delay = self.take()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self.take()
+
+class Outbox():
+    def __init__(self, bot):
+        self.bot = bot
+        self.global_bucket = TokenBucket(*global_rate)
+        self.buckets = {}
+        self.queues = {}
+        self.workers = {}
+        # pending digests by recipient and title, and the fields gathered for each
+        self.digests = {}
+
+    def notify(self, discord_id, title, name, value):
+        # queues a notification for a user, everything with the same title that arrives before the digest goes
+        # out is sent with it. the returned future finishes like the message that carries it, or with None if
+        # the user isn't anywhere we can see them
+        key = (int(discord_id), title)
+        if key not in self.digests:
+            self.digests[key] = []
+            self.bot.loop.call_later(digest_delay, self.send_digest, key)
+        future = self.bot.loop.create_future()
+        self.digests[key].append((name, value, future))
+        return future
+
+    def send_digest(self, key):
+        discord_id, title = key
+        fields = self.digests.pop(key, [])
+        user = self.bot.get_user(discord_id)
+        if user is None:
+            for name, value, future in fields:
+                future.set_result(None)
+            return
+        for start in range(0, len(fields), digest_max_fields):
+            chunk = fields[start:start + digest_max_fields]
+            emb = discord.Embed(color=self.bot.embed_color)
+            emb.set_author(icon_url=self.bot.user.avatar_url, name="WarzoneBot")
+            emb.title = title
+            emb.set_footer(text="Bot created and maintained by -B#0292")
+            for name, value, future in chunk:
+                emb.add_field(name=name, value=value, inline=True)
+            sent = self.queue(user, embed=emb)
+            sent.add_done_callback(functools.partial(self.finish_notifications, [future for name, value, future in chunk]))
+
+    def finish_notifications(self, futures, sent):
+        for future in futures:
+            if future.done():
+                continue
+            if sent.cancelled():
+                future.cancel()
+            elif sent.exception() is not None:
+                future.set_exception(sent.exception())
+            else:
+                future.set_result(sent.result())
+
+    def queue(self, destination, **kwargs):
+        # queues a message for a channel or user, the returned future has the message once it is sent or
+        # the error that made us give up on it
+        route = ("user", destination.id) if isinstance(destination, discord.abc.User) else ("channel", destination.id)
+        future = self.bot.loop.create_future()
+        self.queues.setdefault(route, deque()).append((destination, kwargs, future))
+        if route not in self.workers:
+            self.workers[route] = self.bot.loop.create_task(self.drain(route))
+        return future
+
+    async def send(self, destination, **kwargs):
+        return await self.queue(destination, **kwargs)
+
+    async def drain(self, route):
+        # a worker per destination that has something to send, gone again once its queue is empty
+        bucket = self.buckets.setdefault(route, TokenBucket(*route_rate))
+        queue = self.queues[route]
+        try:
+            while queue:
+                destination, kwargs, future = queue.popleft()
+                try:
+                    message = await self.deliver(bucket, destination, kwargs)
+                    if not future.done():
+                        future.set_result(message)
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+                except Exception as e:
+                    print("Giving up sending to {}: {}".format(route, e))
+                    if not future.done():
+                        future.set_exception(e)
+                        # nobody may be waiting on this one, the error was printed so there's no need to retrieve it
+                        future.add_done_callback(lambda f: f.exception())
+        finally:
+            del self.workers[route]
+            if not queue:
+                del self.queues[route]
+            # once its bucket has had time to fill back up, a destination needs nothing kept for it
+            self.bot.loop.call_later(bucket.per, self.forget_route, route)
+
+    def forget_route(self, route):
+        if route not in self.workers:
+            self.buckets.pop(route, None)
+
+    async def deliver(self, bucket, destination, kwargs):
+        for attempt in range(send_attempts):
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            try:
+                return await destination.send(**kwargs)
+            except Exception as e:
+                if not can_retry(e) or attempt == send_attempts - 1:
+                    raise
+                print_exc()
+            await asyncio.sleep(min(retry_base * 2 ** attempt, retry_max) * random.uniform(1, 1.5))
@@ -1,9 +1,15 @@
 import discord
-from wlct.models import Clan, Player
-from wlct.tournaments import Tournament, TournamentTeam, TournamentPlayer, MonthlyTemplateRotation, get_games_finished_for_team_since, find_tournament_by_id, get_team_data_no_clan, RealTimeLadder, get_real_time_ladder, get_team_data
+import asyncio
+from wlct.bot_db import run_db, link_discord_account, get_tournament_page, get_monthly_template_rotation, get_clan_players, get_player_by_discord_id, get_clans_with_players
 from discord.ext import commands
 from django.conf import settings
 
+previous_page_emoji = "\u25c0"
+next_page_emoji = "\u25b6"
+
+# how long the paging reactions on a listing keep working
+page_timeout = 120
+
 
 class Clot(commands.Cog, name="clot"):
     def __init__(self, bot):
@@ -17,16 +23,13 @@ class Clot(commands.Cog, name="clot"):
         if isinstance(ctx.message.channel, discord.DMChannel):
             print("Token for linking: {} for user: {}".format(arg, ctx.message.author.id))
             # check to see if this player is already linked
-            player = Player.objects.filter(bot_token=arg)
-            if player:
-                player = player[0]
-                if player.discord_id == str(ctx.message.author.id):
-                    await ctx.send("You're account is already linked on the CLOT.")
-                elif player.discord_id == "" or player.discord_id is None:
-                    print("Saving discord id: {} for user".format(str(ctx.message.author.id)))
-                    player.discord_id = str(ctx.message.author.id)
-                    player.save()
+            player, linked = await run_db(link_discord_account, arg, ctx.message.author.id)
+            if player is not None:
+                if linked:
+                    print("Saved discord id: {} for user".format(str(ctx.message.author.id)))
                     await ctx.send("You've successfully linked your discord account to the CLOT.")
+                elif player.discord_id == str(ctx.message.author.id):
+                    await ctx.send("You're account is already linked on the CLOT.")
             else:
                 await ctx.send(
                     "Bot token is invalid. Please visit http://wztourney.herokuapp.com/me to retrieve your token.")
@@ -39,45 +42,74 @@ class Clot(commands.Cog, name="clot"):
                       bb!tournaments -o : Displays Open Tournaments
                       ''')
     async def tournaments(self, ctx, arg):
-        await ctx.send("Gathering tournament data....")
-        tournament_data = ""
-        tournaments = Tournament.objects.all()
         if arg == "-f":
-            tournament_data += "Finished Tournaments\n"
+            title = "Finished Tournaments"
         elif arg == "-o":
-            tournament_data += "Open Tournaments\n"
+            title = "Open Tournaments"
         else:
             await ctx.send("You must specify an option.")
+            return
 
-        for tournament in tournaments:
-            child_tournament = find_tournament_by_id(tournament.id, True)
-            if child_tournament:
-                if arg == "-f":  # only finished tournaments
-                    if child_tournament[0].is_finished:
-                        tournament_data += "{}, Winner: {}\n".format(child_tournament[0].name,
-                                                                     get_team_data(child_tournament[0].winning_team))
-                elif arg == "-o":  # only open tournaments
-                    if not child_tournament[0].has_started and not child_tournament[0].private:
-                        tournament_data += "{} has {} spots left\n".format(child_tournament[0].name,
-                                                                           child_tournament[0].spots_left)
-        await ctx.send(tournament_data)
+        # one page at a time, the reactions move between pages for whoever asked
+        cursors = [None]
+        page = 0
+        rows, has_more = await run_db(get_tournament_page, arg)
+        message = await ctx.send(embed=self.get_tournaments_embed(title, rows, page))
+        if not has_more:
+            return
+
+        await message.add_reaction(previous_page_emoji)
+        await message.add_reaction(next_page_emoji)
+
+        def check(reaction, user):
+            return reaction.message.id == message.id and user == ctx.message.author and str(reaction.emoji) in [previous_page_emoji, next_page_emoji]
+
+        while True:
+            try:
+                reaction, user = await self.bot.wait_for('reaction_add', timeout=page_timeout, check=check)
+            except asyncio.TimeoutError:
+                break
+
+            if str(reaction.emoji) == next_page_emoji and has_more:
+                cursors.append(rows[-1]['id'])
+                page += 1
+            elif str(reaction.emoji) == previous_page_emoji and page > 0:
+                cursors.pop()
+                page -= 1
+            else:
+                continue
+
+            rows, has_more = await run_db(get_tournament_page, arg, cursors[page])
+            await message.edit(embed=self.get_tournaments_embed(title, rows, page))
+            try:
+                await message.remove_reaction(reaction.emoji, user)
+            except discord.Forbidden:
+                # we can't clear reactions without manage messages, they'll just have to click twice
+                pass
+
+    def get_tournaments_embed(self, title, rows, page):
+        emb = discord.Embed(color=self.bot.embed_color)
+        emb.title = title
+        emb.set_footer(text="Page {}".format(page + 1))
+        if len(rows) == 0:
+            emb.description = "There are no tournaments to show."
+        for row in rows:
+            emb.add_field(name=row['name'], value="{} | {} | [View](http://wztourney.herokuapp.com/tournaments/{}/)".format(row['type'], row['detail'], row['id']), inline=False)
+        return emb
 
     @commands.command(brief="Displays the MTC top ten on the CLOT")
     async def mtc(self, ctx):
         await ctx.send("Gathering Monthly Template Rotation data....")
         tournament_data = ""
-        tournament = MonthlyTemplateRotation.objects.filter(id=22)
+        tournament = await run_db(get_monthly_template_rotation, 22)
         if tournament:
-            tournament = tournament[0]
-            tournamentteams = TournamentTeam.objects.filter(tournament=tournament.id, active=True).order_by('-rating',
-                                                                                                            '-wins')
+            # the leaderboard is refreshed by the engine, so this is a single read
             tournament_data += "MTC Top 10\n"
             teams_found = 0
-            for team in tournamentteams:
+            for team in await run_db(tournament.get_leaderboard):
                 if teams_found <= 10:
-                    games_finished = get_games_finished_for_team_since(team.id, tournament, 90)
-                    if games_finished >= 10:
-                        tournament_data += "{}) {} - {}\n".format(teams_found + 1, get_team_data_no_clan(team), team.rating)
+                    if team['games_finished'] >= 10:
+                        tournament_data += "{}) {} - {}\n".format(teams_found + 1, team['name'], team['rating'])
                         teams_found += 1
 
         print("MTC: {}\nLength: {}".format(tournament_data, len(tournament_data)))
@@ -90,13 +122,12 @@ class Clot(commands.Cog, name="clot"):
                       ''')
     async def clan(self, ctx, clanid):
         await ctx.send("Gathering player data for clan {}....".format(clanid))
-        clan_obj = Clan.objects.filter(pk=int(clanid))
+        clan_obj, players = await run_db(get_clan_players, int(clanid))
         emb = discord.Embed(color=self.bot.embed_color)
         if clan_obj:
-            emb.title = "{}".format(clan_obj[0].name)
-            emb.set_thumbnail(url=clan_obj[0].image_path)
+            emb.title = "{}".format(clan_obj.name)
+            emb.set_thumbnail(url=clan_obj.image_path)
             player_data = ""
-            players = Player.objects.filter(clan=clan_obj[0].id).order_by('name')
             current_player = 0
             if players:
                 for player in players:
@@ -108,7 +139,7 @@ class Clot(commands.Cog, name="clot"):
                 emb.add_field(name="Registered members on CLOT", value=player_data)
                 await ctx.send(embed=emb)
             else:
-                await ctx.send("No players are registered on the CLOt for {}".format(clan_obj[0].name))
+                await ctx.send("No players are registered on the CLOt for {}".format(clan_obj.name))
         else:
             await ctx.send("Clan with id {} not found. Please use bb!clans to show valid clans.".format(clanid))
 
@@ -116,7 +147,7 @@ class Clot(commands.Cog, name="clot"):
     async def profile(self, ctx):
         discord_id = str(ctx.message.author.id)
 
-        player = Player.objects.filter(discord_id=discord_id)
+        player = await run_db(get_player_by_discord_id, discord_id)
         if player:
             await ctx.send("{} | https://warzone.com/Profile?p={}".format(player.name, player.token))
         else:
@@ -124,13 +155,10 @@ class Clot(commands.Cog, name="clot"):
 
     @commands.command(brief="Displays all clans on the CLOT")
     async def clans(self, ctx):
-        clans = Clan.objects.all()
         await ctx.send("Gathering clans data....")
         clans_data = "Clans on the CLOT\n\n"
-        for clan in clans:
-            player = Player.objects.filter(clan=clan)
-            if player:
-                clans_data += "{}: {}\n".format(clan.id, clan.name)
+        for clan in await run_db(get_clans_with_players):
+            clans_data += "{}: {}\n".format(clan.id, clan.name)
         await ctx.send(clans_data)
 
 def setup(bot):
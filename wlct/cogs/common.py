@@ -1,15 +1,26 @@
 import discord
-from discord.ext import commands
-import urllib.request
-import requests
+from discord.ext import commands, tasks
+import aiohttp
+import asyncio
 import json
+import time
 from bs4 import BeautifulSoup
-from wlct.models import Engine
-from wlct.logging import TournamentGameLog, ProcessGameLog
+from wlct.bot_db import run_db, get_engine, get_game_log_messages
 from wlct.cogs.help import get_help_embed
 from django.utils import timezone
+from traceback import print_exc
 import datetime
-from django.core.paginator import Paginator
+
+mdl_url = "http://md-ladder.cloudapp.net/api/v1.0/players/?topk=10"
+ladder_pageurls = ['https://www.warzone.com/LadderSeason?ID=0', 'http://www.warzone.com/LadderSeason?ID=1',
+                   'https://www.warzone.com/LadderSeason?ID=4']
+status_urls = {'clot': 'http://wztourney.herokuapp.com', 'wz': 'https://www.warzone.com/MultiPlayer/'}
+
+# scraped rankings are kept this long, and refreshed in the background a little more often than that so
+# commands never wait on warzone.com
+scrape_ttl = 900
+scrape_refresh_interval = 600.0
+status_ttl = 60
 
 
 def is_admin(discord_id):
@@ -17,9 +28,105 @@ def is_admin(discord_id):
         return True
     return False
 
+def parse_status(status, content):
+    return status == 200
+
+def parse_mdl(status, content):
+    data = json.loads(content)
+    mdl_data = "Deadman's Multi-Day Ladder Top 10\n"
+    mdl_data += "=================================\n"
+    current_player = 1
+    for index, player in enumerate(data['players']):
+        # once we have the players, start printing out each of the top 10
+        mdl_data += (str(current_player) + ") " + player['player_name'] + " Rating:" + str(
+            player['displayed_rating'])) + "\n"
+        current_player += 1
+    return mdl_data
+
+def parse_ladder_page(status, content):
+    # the lines of the rankings table on a ladder page, starting with the ladder's name
+    soup = BeautifulSoup(content, 'html.parser')
+    header_str = soup.title.string.split("-")
+    lines = ["__" + header_str[0].strip() + "__"]
+    for table in soup.find_all('table'):
+        found_table = False
+        for row in table.find_all('tr'):
+            columns = row.find_all('td')
+            if any("Rank" in column.get_text() for column in columns):
+                found_table = True
+            elif found_table and len(columns) == 3:
+                rating_column = columns[2]
+                team_column = columns[1]
+                data = columns[0].get_text().strip()
+                data += ") "
+                current_link = 0
+                for link in team_column.find_all('a'):
+                    if "LadderTeam" in link.get('href', ''):
+                        if link.get_text().strip() != "":
+                            data += link.get_text().strip() + " "
+                        current_link += 1
+                        if (current_link > 1) and (current_link < len(columns)):
+                            data += "/ "
+
+                data += " Rating: " + rating_column.get_text().strip()
+                lines.append(data)
+        if found_table:
+            break
+    return lines
+
 class Common(commands.Cog, name="general"):
     def __init__(self, bot):
         self.bot = bot
+        self.session = None
+        self.scrapes = {}
+        self.scrapes_in_progress = {}
+        self.refresh_scrapes.start()
+
+    def cog_unload(self):
+        self.refresh_scrapes.cancel()
+        if self.session is not None:
+            self.bot.loop.create_task(self.session.close())
+
+    async def fetch(self, url):
+        if self.session is None:
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=20))
+        async with self.session.get(url) as response:
+            return response.status, await response.text()
+
+    async def scrape(self, url, parse):
+        try:
+            status, content = await self.fetch(url)
+            # parsing a page takes a while, keep it off the event loop
+            result = await self.bot.loop.run_in_executor(None, parse, status, content)
+            self.scrapes[url] = (time.monotonic(), result)
+            return result
+        finally:
+            del self.scrapes_in_progress[url]
+
+    async def get_scraped(self, url, parse, ttl=scrape_ttl, refresh=False, serve_stale=True):
+        # the parsed result of a page, fetched at most once per ttl. commands asking for a page that's
+        # being fetched wait on that one fetch, and if it fails they get the last good copy
+        cached = self.scrapes.get(url)
+        if not refresh and cached is not None and time.monotonic() - cached[0] < ttl:
+            return cached[1]
+        if url not in self.scrapes_in_progress:
+            self.scrapes_in_progress[url] = self.bot.loop.create_task(self.scrape(url, parse))
+        try:
+            return await asyncio.shield(self.scrapes_in_progress[url])
+        except Exception:
+            if serve_stale and cached is not None:
+                print_exc()
+                return cached[1]
+            raise
+
+    @tasks.loop(seconds=scrape_refresh_interval)
+    async def refresh_scrapes(self):
+        await self.bot.wait_until_ready()
+        for url, parse in [(mdl_url, parse_mdl)] + [(url, parse_ladder_page) for url in ladder_pageurls]:
+            try:
+                await self.get_scraped(url, parse, refresh=True)
+            except Exception:
+                print_exc()
 
     @commands.command(brief="Check the status of the CLOT or Warzone Server",
                       usage='''
@@ -27,15 +134,15 @@ class Common(commands.Cog, name="general"):
                       status wz
                       ''')
     async def status(self, ctx, server):
-        url = ""
-        if server == "clot" or server == "CLOT":
-            url = 'http://wztourney.herokuapp.com'
-            r = requests.get(url)
-        elif server == "wz" or server == "WZ":
-            url = 'https://www.warzone.com/MultiPlayer/'
-            r = requests.get(url)
-        r.status_code
-        if str(r.status_code) == "200":
+        url = status_urls.get(server.lower())
+        if url is None:
+            await ctx.send("You must specify either clot or wz.")
+            return
+        try:
+            online = await self.get_scraped(url, parse_status, status_ttl, serve_stale=False)
+        except Exception:
+            online = False
+        if online:
             status = "{} - ONLINE".format(url)
         else:
             status = "{} - OFFLINE".format(url)
@@ -52,9 +159,8 @@ class Common(commands.Cog, name="general"):
 
     @commands.command(brief="Displays data about the engine")
     async def engine(self, ctx):
-        engine = Engine.objects.all()
+        engine = await run_db(get_engine)
         if engine:
-            engine = engine[0]
             time_since_run = timezone.now() - engine.last_run_time
             if engine.next_run_time:
                 time_to_run = engine.next_run_time - timezone.now()
@@ -72,14 +178,12 @@ class Common(commands.Cog, name="general"):
             if game_id != 0 and num_logs != -1 and page != -1:
                 # good
                 print("Game Id: {}, num_logs per page: {}, page: {}".format(game_id, num_logs, page))
-                game_logs = ProcessGameLog.objects.filter(game__gameid=int(game_id)).order_by('id')
-                print("Number game logs: {}".format(game_logs.count()))
-                paginator = Paginator(game_logs, num_logs)
-                page = paginator.get_page(page)
-                for log in page:
-                    await ctx.message.author.send(log.msg[0:1900])
-                    if len(log.msg) > 1900:
-                        await ctx.message.author.send(log.msg[1900:])
+                game_logs = await run_db(get_game_log_messages, game_id, num_logs, page)
+                print("Number game logs: {}".format(len(game_logs)))
+                for msg in game_logs:
+                    await ctx.message.author.send(msg[0:1900])
+                    if len(msg) > 1900:
+                        await ctx.message.author.send(msg[1900:])
             else:
                 await ctx.send("You must pass in all parameters to the command.")
         else:
@@ -94,65 +198,22 @@ class Common(commands.Cog, name="general"):
 
     @commands.command(brief="Displays Deadman's Multi-Day Ladder Top 10")
     async def mdl(self, ctx):
-        await ctx.send("Gathering MDL rankings data....")
         """displays the top 10 on Deadman's MDL"""
-        mdl_url = "http://md-ladder.cloudapp.net/api/v1.0/players/?topk=10"
-
-        content = urllib.request.urlopen(mdl_url).read()
-
-        data = json.loads(content)
-        mdl_data = "Deadman's Multi-Day Ladder Top 10"
-        mdl_data += "================================="
-        current_player = 1
-        for index, player in enumerate(data['players']):
-            # once we have the players, start printing out each of the top 10
-            mdl_data += (str(current_player) + ") " + player['player_name'] + " Rating:" + str(
-                player['displayed_rating']))
-            current_player += 1
-
-        await ctx.send(mdl_data)
+        await ctx.send(await self.get_scraped(mdl_url, parse_mdl))
 
     @commands.command(brief="Displays all Warzone ladder rankings")
     async def ladders(self, ctx):
-        await ctx.send("Gathering ladder rankings data....")
         """displays the top 10 on all WL ladders"""
-        ladder_pageurls = ['https://www.warzone.com/LadderSeason?ID=0', 'http://www.warzone.com/LadderSeason?ID=1',
-                           'https://www.warzone.com/LadderSeason?ID=4']
         for ladder_pageurl in ladder_pageurls:
-            ladder_page = urllib.request.urlopen(ladder_pageurl)
-            soup = BeautifulSoup(ladder_page, 'html.parser')
-            tables = soup.find_all('table')
-
-            header_str = soup.title.string.split("-")
-            for table in tables:
-                data = "__" + header_str[0].strip() + "__"
-                rows = table.find_all('tr')
-                for row in rows:
-                    columns = row.find_all('td')
-                    for column in columns:
-                        if column.contents[0].strip() and "Rank" in column.contents[0].strip():
-                            found_table = True
-                            break
-                        elif len(columns) == 3:
-                            rating_column = columns[2]
-                            team_column = columns[1]
-                            data = columns[0].contents[0].strip()
-                            data += ") "
-                            current_link = 0
-                            for link in team_column.find_all('a'):
-                                if "LadderTeam" in link.get('href'):
-                                    if (link.contents[0].strip()) != "":
-                                        data += link.contents[0].strip() + " "
-                                    current_link += 1
-                                    if (current_link > 1) and (current_link < len(columns)):
-                                        data += "/ "
-
-                            data += " Rating: " + rating_column.contents[0]
+            # as few messages as fit, each under discord's limit
+            data = ""
+            for line in await self.get_scraped(ladder_pageurl, parse_ladder_page):
+                if len(data) + len(line) > 1900:
                     await ctx.send(data)
-                if found_table:
-                    found_table = False
-                    await ctx.send("====================================================")
-                    break
+                    data = ""
+                data += line + "\n"
+            data += "===================================================="
+            await ctx.send(data)
 
 
 def setup(bot):
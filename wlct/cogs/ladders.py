@@ -1,16 +1,65 @@
 import discord
-from wlct.models import Clan, Player
-from wlct.tournaments import Tournament, TournamentTeam, TournamentPlayer, MonthlyTemplateRotation, get_games_finished_for_team_since, find_tournament_by_id, get_team_data_no_clan, RealTimeLadder, get_real_time_ladder, TournamentGame
+import time
+from collections import defaultdict
+from wlct.tournaments import get_real_time_ladder
+from wlct.bot_db import run_db, get_real_time_ladders
 from discord.ext import commands, tasks
 from wlct.cogs.common import is_admin
 from django.utils import timezone
 from traceback import print_exc
 
+# the read-only views of a ladder, kept in memory until we hear the ladder changed
+ladder_views = {'joined': 'get_current_joined', 'rankings': 'get_current_rankings', 'games': 'get_current_games', 'templates': 'get_current_templates'}
+
+# in case a notification about the ladder was missed, nothing is kept longer than this
+ladder_cache_timeout = 300
+
 class Ladders(commands.Cog, name="ladders"):
     ''' Actually sends the help command '''
 
     def __init__(self, bot):
         self.bot = bot
+        self.ladders = {}
+        self.ladder_views = {}
+        # moves every time a ladder is invalidated, so a view built while the ladder changed is never kept
+        self.ladder_generations = defaultdict(int)
+
+    def get_cached(self, cache, key):
+        cached = cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < ladder_cache_timeout:
+            return cached[1]
+        return None
+
+    async def get_ladder(self, ladder_id):
+        ladder = self.get_cached(self.ladders, ladder_id)
+        if ladder is None:
+            generation = self.ladder_generations[ladder_id]
+            ladder = await run_db(get_real_time_ladder, ladder_id)
+            if ladder is not None and generation == self.ladder_generations[ladder_id]:
+                self.ladders[ladder_id] = (time.monotonic(), ladder)
+        return ladder
+
+    async def get_ladder_view(self, ladder, view):
+        data = self.get_cached(self.ladder_views, (ladder.id, view))
+        if data is None:
+            generation = self.ladder_generations[ladder.id]
+            data = await run_db(getattr(ladder, ladder_views[view]))
+            if generation == self.ladder_generations[ladder.id]:
+                self.ladder_views[(ladder.id, view)] = (time.monotonic(), data)
+        return data
+
+    def invalidate_ladder(self, ladder_id):
+        self.ladder_generations[ladder_id] += 1
+        self.ladders.pop(ladder_id, None)
+        for view in ladder_views:
+            self.ladder_views.pop((ladder_id, view), None)
+
+    @commands.Cog.listener()
+    async def on_tournament_event(self, message):
+        # games created or finished, ratings moved or the ladder itself changed
+        for tournament_id in message['tournaments']:
+            if tournament_id in self.ladder_generations:
+                self.invalidate_ladder(tournament_id)
 
     @commands.command(brief="Lists all real-time ladders hosted by this bot and their IDs",
              usage='''
@@ -34,50 +83,54 @@ class Ladders(commands.Cog, name="ladders"):
             emb.set_author(icon_url=ctx.message.author.avatar_url, name=ctx.message.author)
             emb.set_footer(text="Bot created and maintained by -B#0292")
             if arg_id.isnumeric():
-                ladder = get_real_time_ladder(int(arg_id))
+                ladder = await self.get_ladder(int(arg_id))
                 discord_id = str(ctx.message.author.id)
                 if ladder is not None:
                     if arg_cmd == "-p":
                         # display current players in the ladder
-                        retStr = ladder.get_current_joined()
+                        retStr = await self.get_ladder_view(ladder, 'joined')
                     elif arg_cmd == "-j":
-                        retStr = ladder.join_ladder(discord_id)
-                        retStr += "\n\n" + ladder.get_current_joined()
+                        retStr = await run_db(ladder.join_ladder, discord_id)
+                        self.invalidate_ladder(ladder.id)
+                        retStr += "\n\n" + await self.get_ladder_view(ladder, 'joined')
                         do_all_channels = True
                     elif arg_cmd == "-l":
-                        retStr = ladder.leave_ladder(discord_id)
-                        retStr += "\n\n" + ladder.get_current_joined()
+                        retStr = await run_db(ladder.leave_ladder, discord_id)
+                        self.invalidate_ladder(ladder.id)
+                        retStr += "\n\n" + await self.get_ladder_view(ladder, 'joined')
                         do_all_channels = True
                     elif arg_cmd == "-t":
-                        retStr = ladder.get_current_templates()
+                        retStr = await self.get_ladder_view(ladder, 'templates')
                         do_embed = True
                         emb.title = "Current Templates - Ladder {}".format(ladder.name)
                         emb.add_field(name="Templates", value=retStr)
                     elif arg_cmd == "-r":
-                        retStr = ladder.get_current_rankings()
+                        retStr = await self.get_ladder_view(ladder, 'rankings')
                     elif arg_cmd == "-g":
                         do_embed = True
-                        retStr = ladder.get_current_games()
+                        retStr = await self.get_ladder_view(ladder, 'games')
                         emb.title = "Current Games - Ladder {}".format(ladder.name)
                         emb.add_field(name="In Progress", value=retStr)
                     elif arg_cmd == "-v":
                         if arg_cmd2 != "invalid_cmd2":
-                            retStr = ladder.veto_template(discord_id, arg_cmd2)
+                            retStr = await run_db(ladder.veto_template, discord_id, arg_cmd2)
                         else:
                             # display the users current veto
-                            retStr = ladder.get_current_vetoes(discord_id)
+                            retStr = await run_db(ladder.get_current_vetoes, discord_id)
                     elif arg_cmd == "-ta":
                         if arg_cmd2 != "invalid_cmd2":
                             # check to make sure the author has access here
                             if is_admin(ctx.message.author.id):
-                                retStr = ladder.add_template(arg_cmd2)
+                                retStr = await run_db(ladder.add_template, arg_cmd2)
+                                self.invalidate_ladder(ladder.id)
                         else:
                             retStr = invalid_cmd_text
                     elif arg_cmd == "-tr":
                         if arg_cmd2 != "invalid_cmd2":
                             # check for access
                             if is_admin(ctx.message.author.id):
-                                retStr = ladder.remove_template(arg_cmd2)
+                                retStr = await run_db(ladder.remove_template, arg_cmd2)
+                                self.invalidate_ladder(ladder.id)
                         else:
                             retStr = invalid_cmd_text
                     else:
@@ -88,8 +141,8 @@ class Ladders(commands.Cog, name="ladders"):
                 retStr = "You've entered an invalid ladder ID."
         elif arg_id == "invalid_id":
             retStr += "__**Current Real-Time Ladders**__\n"
-            ladders = RealTimeLadder.objects.all()
-            if not ladders or ladders.count() == 0:
+            ladders = await run_db(get_real_time_ladders)
+            if len(ladders) == 0:
                 retStr += "There are no real-time ladders created yet."
             else:
                 for ladder in ladders:
@@ -1,64 +1,143 @@
 import discord
-from wlct.models import Clan, Player
-from wlct.tournaments import Tournament, TournamentTeam, TournamentPlayer, MonthlyTemplateRotation, get_games_finished_for_team_since, find_tournament_by_id, get_team_data_no_clan, RealTimeLadder, get_real_time_ladder, TournamentGame
+import asyncio
+import json
+from wlct.bot_outbox import can_retry
+from wlct.bot_db import run_db, get_unmentioned_ladder_games, mark_games_mentioned, get_linked_discord_ids
+from wlct.events import get_listen_connection
 from discord.ext import commands, tasks
 from wlct.cogs.common import is_admin
 from django.utils import timezone
+from django.db import connection
+from django.core.exceptions import ImproperlyConfigured
 from traceback import print_exc
 
+# new ladder games are pushed by the engine as they are created, the background task only polls for them
+# this often in case a notification was missed
+task_interval = 300.0
+
 class Tasks(commands.Cog, name="tasks"):
     def __init__(self, bot):
         self.bot = bot
         self.last_task_run = timezone.now()
         self.executions = 0
+        self.rtl_lock = asyncio.Lock()
+        self.rtl_scan_pending = False
+        # games whose notifications are queued but not sent yet, later scans leave them alone
+        self.rtl_announcing = set()
         self.bg_task.start()
+        self.listener = self.bot.loop.create_task(self.listen_for_events())
+
+    def cog_unload(self):
+        self.bg_task.cancel()
+        self.listener.cancel()
+
+    async def listen_for_events(self):
+        # wait on the engine's notifications with the socket registered on the event loop, so nothing blocks
+        # while there is nothing to hear
+        await self.bot.wait_until_ready()
+        if connection.vendor != 'postgresql':
+            # no notifications outside of postgres, the background task picks up new games
+            return
+        loop = self.bot.loop
+        while not self.bot.is_closed():
+            listen_connection = None
+            try:
+                listen_connection = await run_db(get_listen_connection)
+                lost = loop.create_future()
+
+                def on_readable():
+                    try:
+                        listen_connection.poll()
+                        while listen_connection.notifies:
+                            self.handle_event(listen_connection.notifies.pop(0).payload)
+                    except Exception as e:
+                        if not lost.done():
+                            lost.set_exception(e)
+
+                loop.add_reader(listen_connection, on_readable)
+                try:
+                    # a scan right away covers anything created while we weren't listening
+                    self.schedule_rtl_scan()
+                    await lost
+                finally:
+                    loop.remove_reader(listen_connection)
+            except asyncio.CancelledError:
+                raise
+            except ImproperlyConfigured:
+                # retrying won't help, the background task still finds new games
+                print_exc()
+                return
+            except Exception:
+                print_exc()
+                await asyncio.sleep(5)
+            finally:
+                if listen_connection is not None:
+                    listen_connection.close()
+
+    def handle_event(self, payload):
+        message = json.loads(payload)
+        # the other cogs hear about every event through on_tournament_event
+        self.bot.dispatch("tournament_event", message)
+        if message['event'] == "game_created":
+            self.schedule_rtl_scan()
+
+    def schedule_rtl_scan(self):
+        # a burst of notifications while a scan is waiting to run is covered by that one scan
+        if not self.rtl_scan_pending:
+            self.rtl_scan_pending = True
+            self.bot.loop.create_task(self.run_rtl_scan())
+
+    async def run_rtl_scan(self):
+        async with self.rtl_lock:
+            self.rtl_scan_pending = False
+            try:
+                await self.handle_rtl_tasks()
+            except Exception:
+                print_exc()
 
     async def handle_rtl_tasks(self):
-        ladders = RealTimeLadder.objects.all()
-        for ladder in ladders:
-            print("Handling rtl tasks....")
-            games = TournamentGame.objects.filter(tournament=ladder, is_finished=False, mentioned=False)
-            print("Total game count: {}".format(games.count()))
-            # cache the game data + link for use with the embed
-            emb = discord.Embed(color=self.bot.embed_color)
-            emb.set_author(icon_url=self.bot.user.avatar_url, name="WarzoneBot")
-            emb.title = "New Ladder Game Created"
-            emb.set_footer(text="Bot created and maintained by -B#0292")
-            for game in games:
-                print("RTL: Found game")
-                data = ""
-                team1 = game.teams.split('.')[0]
-                team2 = game.teams.split('.')[1]
-                player1 = ladder.get_player_from_teamid(team1)
-                player2 = ladder.get_player_from_teamid(team2)
-                data += "<@{}> vs. <@{}> [Game Link]({})\n".format(player1.discord_id, player2.discord_id,
-                                                                   game.game_link)
-                emb.add_field(name="Game", value=data, inline=True)
-                if player1:
-                    user = self.bot.get_user(int(player1.discord_id))
-                    if user:
-                        await user.send(embed=emb)
-                if player2:
-                    user = self.bot.get_user(int(player2.discord_id))
-                    if user:
-                        await user.send(embed=emb)
-                        game.mentioned = True
-                        game.save()
+        print("Handling rtl tasks....")
+        games = await run_db(get_unmentioned_ladder_games)
+        games = [game for game in games if game['id'] not in self.rtl_announcing]
+        print("Total game count: {}".format(len(games)))
+        for game in games:
+            print("RTL: Found game")
+            # a player in several new games gets them together in one message
+            data = "<@{}> vs. <@{}> [Game Link]({})\n".format(game['discord_ids'][0], game['discord_ids'][1], game['game_link'])
+            notifications = []
+            for discord_id in game['discord_ids']:
+                if discord_id:
+                    notifications.append(self.bot.outbox.notify(discord_id, "New Ladder Game Created", "Game", data))
+            self.rtl_announcing.add(game['id'])
+            self.bot.loop.create_task(self.mark_game_mentioned(game['id'], notifications))
+
+    async def mark_game_mentioned(self, game_id, notifications):
+        # the game is only marked once both players were told, or can never be (dms closed). if the bot restarts
+        # first or discord stays unreachable the next scan announces it again
+        results = await asyncio.gather(*notifications, return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        try:
+            if not any(isinstance(error, asyncio.CancelledError) or can_retry(error) for error in errors):
+                await run_db(mark_games_mentioned, [game_id])
+        except Exception:
+            print_exc()
+        finally:
+            self.rtl_announcing.discard(game_id)
 
     async def handle_hours4_tasks(self):
-        # every 4 hours if you haven't linked your WZ account to the CLOT, you should do so
-        # get all the members in all servers
+        # every 4 hours report how many of the members in all servers have linked their WZ account to the CLOT
         print("Running 4 hours tasks")
-        member_list = []
+        start_time = timezone.now()
+        member_ids = set()
         for guild in self.bot.guilds:
             for member in guild.members:
-                if member.id not in member_list:
-                    member_list.append(member.id)
+                member_ids.add(member.id)
 
-        # now that we have all the members...let's look up the player for the ids...if there is no player
-        # we should PM them that they need to link their CLOT account discord, only do this once
-        for memid in member_list:
-            await self.process_member_join(memid)
+        # now that we have all the members...look up which of them are linked in a few queries and diff in memory
+        linked = await run_db(get_linked_discord_ids, member_ids)
+        unlinked = [memid for memid in member_ids if str(memid) not in linked]
+        print("Member links: {} members, {} linked, {} not linked in {} seconds".format(len(member_ids), len(member_ids) - len(unlinked),
+                                                                                       len(unlinked), (timezone.now() - start_time).total_seconds()))
 
     async def handle_hours_tasks(self):
         print("Running hourly task")
@@ -67,10 +146,9 @@ class Tasks(commands.Cog, name="tasks"):
     async def handle_all_tasks(self):
         # calculate the time different here
         # determine if we need hours run or 4 hours run
-        # for 1 hour, executions should be 360
-        hours_executions = 360
-        hours = (self.executions % 360 == 0)
-        hours4 = (self.executions % (360*4) == 0)
+        hours_executions = int(3600 / task_interval)
+        hours = (self.executions % hours_executions == 0)
+        hours4 = (self.executions % (hours_executions*4) == 0)
 
         if hours:
             await self.handle_hours_tasks()
@@ -81,32 +159,13 @@ class Tasks(commands.Cog, name="tasks"):
         await self.handle_always_tasks()
 
     async def handle_always_tasks(self):
-        await self.handle_rtl_tasks()
-
-    async def process_member_join(self, memid):
-        player = Player.objects.filter(discord_id=str(memid))
-        member = self.bot.get_user(memid)
-        if not player and member:
-            emb = discord.Embed(color=self.bot.embed_color)
-            emb.set_author(icon_url=self.bot.user.avatar_url, name="WarzoneBot")
-            emb.title = "It's nice to meet you!"
-            emb.set_footer(text="Bot created and maintained by -B#0292")
-            msg = "Hello {}\n\nI'm a homemade Warzone Discord Bot. \n\nI'm reaching out because your discord account".format(
-                member.name)
-            msg += " is not linked to the CLOT (custom ladder or tournament). Please see http://wztourney.herokuapp.com/me/ for instructions"
-            msg += " on how to link the two accounts together.\n\nThis will allow you to participate in the bot's"
-            msg += " new real-time-ladder, as well as help to become verified in the Warzone discord server."
-            emb.add_field(name="Welcome", value=msg)
-            print("Sending {} a welcome message!".format(member.name))
-
-            #await member.send(embed=emb)
-            #player[0].link_mention = True
-            #player[0].save()
-
-    @tasks.loop(seconds=10.0)
+        async with self.rtl_lock:
+            await self.handle_rtl_tasks()
+
+    @tasks.loop(seconds=task_interval)
     async def bg_task(self):
-        # runs every 10 seconds to check various things
-        # are there any new games on the RTL that just got allocated?
+        # runs every 5 minutes to check various things
+        # are there any new games on the RTL that we didn't hear about?
         try:
             await self.bot.wait_until_ready()
             owner = self.bot.owner
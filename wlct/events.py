@@ -0,0 +1,126 @@
+# live events for tournaments and ladders
+# the engine emits an event whenever a game is created or finishes or a round is finished, and every process
+# that wants them listens on one postgres channel. subscribers get a queue of events for the tournaments they
+# care about, so hundreds of them can wait on a single listening connection
+
+import json
+import queue
+import select
+import threading
+import time
+import dj_database_url
+from collections import defaultdict
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from wlct.logging import log_exception
+
+EVENTS_CHANNEL = "wlct_events"
+
+def emit_event(tournament_ids, event, data):
+    # notifications are sent when the transaction commits, so nobody hears about rows they can't read yet
+    payload = json.dumps({'tournaments': tournament_ids, 'event': event, 'data': data})
+    try:
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_notify(%s, %s)", [EVENTS_CHANNEL, payload])
+        else:
+            # no notifications outside of postgres, only this process hears about it
+            event_broker.publish(payload)
+    except Exception:
+        log_exception()
+
+def emit_tournament_event(tournament, event, **data):
+    # events in a round robin that belongs to a league or group stage are shown on the parent's page too
+    tournament_ids = [tournament.id]
+    parent_tournament_id = getattr(tournament, 'parent_tournament_id', None)
+    if parent_tournament_id is not None:
+        tournament_ids.append(parent_tournament_id)
+    emit_event(tournament_ids, event, data)
+
+def get_listen_connection():
+    import psycopg2
+
+    # listening needs its own session, so when the default connection goes through pgbouncer pooling by
+    # transaction EVENTS_DATABASE_URL should point straight at the database
+    if settings.EVENTS_DATABASE_URL:
+        config = dj_database_url.parse(settings.EVENTS_DATABASE_URL)
+        params = {'database': config['NAME'], 'user': config['USER'], 'password': config['PASSWORD'], 'host': config['HOST'], 'port': config['PORT']}
+    elif settings.DATABASE_BEHIND_PGBOUNCER:
+        # LISTEN through transaction pooling succeeds and then never hears anything
+        raise ImproperlyConfigured("EVENTS_DATABASE_URL must be set to a direct database url when DATABASE_URL goes through pgbouncer")
+    else:
+        params = connection.get_connection_params()
+
+    # a listener only ever reads, keepalives make a connection that silently went away fail instead of
+    # waiting on it forever
+    listen_connection = psycopg2.connect(keepalives=1, keepalives_idle=60, keepalives_interval=10, keepalives_count=3, **params)
+    listen_connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    with listen_connection.cursor() as cursor:
+        cursor.execute("LISTEN {}".format(EVENTS_CHANNEL))
+    return listen_connection
+
+class EventBroker():
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(set)
+        self.subscriber_count = 0
+        self.listener = None
+        self.available = True
+
+    def subscribe(self, tournament_id):
+        # None once the process already has as many subscribers as it allows, or if it can't listen at all
+        subscriber = queue.Queue(maxsize=100)
+        with self.lock:
+            if not self.available or self.subscriber_count >= settings.EVENT_STREAMS_MAX:
+                return None
+            self.subscriber_count += 1
+            self.subscribers[tournament_id].add(subscriber)
+            if self.listener is None and connection.vendor == 'postgresql':
+                self.listener = threading.Thread(target=self.listen, daemon=True)
+                self.listener.start()
+        return subscriber
+
+    def unsubscribe(self, tournament_id, subscriber):
+        with self.lock:
+            if subscriber in self.subscribers.get(tournament_id, ()):
+                self.subscriber_count -= 1
+            self.subscribers[tournament_id].discard(subscriber)
+            if len(self.subscribers[tournament_id]) == 0:
+                del self.subscribers[tournament_id]
+
+    def publish(self, payload):
+        message = json.loads(payload)
+        with self.lock:
+            subscribers = [subscriber for tournament_id in message['tournaments'] for subscriber in self.subscribers.get(tournament_id, [])]
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # a subscriber that stopped reading just misses events
+                pass
+
+    def listen(self):
+        # one connection per process listens for every tournament and fans the events out
+        while True:
+            listen_connection = None
+            try:
+                listen_connection = get_listen_connection()
+                while True:
+                    if select.select([listen_connection], [], [], 60) != ([], [], []):
+                        listen_connection.poll()
+                        while listen_connection.notifies:
+                            self.publish(listen_connection.notifies.pop(0).payload)
+            except ImproperlyConfigured:
+                # retrying won't help, say so once and turn new streams away so the pages poll instead
+                log_exception()
+                self.available = False
+                return
+            except Exception:
+                log_exception()
+                time.sleep(5)
+            finally:
+                if listen_connection is not None:
+                    listen_connection.close()
+
+event_broker = EventBroker()
@@ -5,6 +5,8 @@ import datetime
 from django.utils import timezone
 from wlct.tournaments import RealTimeLadder, TournamentGame, get_team_data_sameline, get_team_data_no_clan
 from wlct.models import Engine
+from wlct.bot_outbox import Outbox
+from wlct.bot_channels import ChannelRegistry
 import asyncio
 import discord
 import os
@@ -33,13 +35,14 @@ class WZBot(commands.AutoShardedBot):
         self.cmdUsage = {}
         self.cmdUsers = {}
         self.guildUsage = {}
-        self.rtl_channels = []
-        self.clan_league_channels = []
-        self.mtc_channels = []
+        self.channel_registry = ChannelRegistry(self)
         self.last_task_run = timezone.now()
 
         self.executions = 0
 
+        # notifications and broadcasts go out through here so they stay inside discord's rate limits
+        self.outbox = Outbox(self)
+
         # deltas for when the bot does stuff
 
         for ext in EXTENSIONS:
@@ -51,8 +54,8 @@ class WZBot(commands.AutoShardedBot):
         return self.get_user(self.owner_id)
 
     async def on_disconnect(self):
-        for channel in self.rtl_channels:
-            await channel.send("Updating my code...be right back...")
+        for channel in self.channel_registry.get_channels("rtl"):
+            self.outbox.queue(channel, content="Updating my code...be right back...")
 
     async def on_message(self, msg):
         if not self.is_ready() or msg.author.bot:
@@ -60,31 +63,38 @@ class WZBot(commands.AutoShardedBot):
 
         await self.process_commands(msg)
 
-    async def on_member_join(self, member):
-        cog = self.get_cog("tasks")
-        if cog:
-            cog.process_member_join(member.id)
-
     async def on_ready(self):
         print(f'[CONNECT] Logged in as:\n{self.user} (ID: {self.user.id})\n')
 
-        # cache all the guilds we're in when we login and the real-time-ladder channels
-        for guild in self.guilds:
-            for channel in guild.channels:
-                if channel.name == "real-time-ladder" or channel.name == "real_time_ladder":
-                    print("Caching RTL channel in guild: {}".format(guild.name))
-                    self.rtl_channels.append(channel)
-                elif channel.name == "monthly-template-circuit" or channel.name == "monthly_template_circuit":
-                    self.mtc_channels.append(channel)
-                elif channel.name == "clan-league-bot-chat" or channel.name == "clan-league-bot-chat":
-                    self.clan_league_channels.append(channel)
+        # every shard is ready by now, this only indexes one whose shard ready we didn't hear
+        for shard_id in {guild.shard_id for guild in self.guilds}:
+            self.channel_registry.index_shard(shard_id)
 
         if not hasattr(self, 'uptime'):
             self.uptime = timezone.now()
 
+    async def on_shard_ready(self, shard_id):
+        # find the channels we broadcast to the first time a shard is ready, after that the events below keep
+        # them current so a reconnect doesn't scan every channel again
+        self.channel_registry.index_shard(shard_id)
+
+    async def on_guild_join(self, guild):
+        self.channel_registry.add_guild(guild)
+
+    async def on_guild_remove(self, guild):
+        self.channel_registry.remove_guild(guild)
+
+    async def on_guild_channel_create(self, channel):
+        self.channel_registry.add_channel(channel)
+
+    async def on_guild_channel_update(self, before, after):
+        self.channel_registry.update_channel(after)
+
+    async def on_guild_channel_delete(self, channel):
+        self.channel_registry.remove_channel(channel)
 
     def get_channel_list(self):
-        return self.rtl_channels
+        return self.channel_registry.get_channels("rtl")
 
 class Command(BaseCommand):
     help = "Runs the CLOT Bot"
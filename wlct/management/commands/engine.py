@@ -5,7 +5,7 @@ from wlct.logging import log, LogLevel, log_exception, Logger, TournamentLog
 from bs4 import BeautifulSoup
 from urllib.request import urlopen
 from wlct.models import Clan, Engine
-from wlct.tournaments import TournamentGame, Tournament, TournamentRound, find_tournament_by_id, TournamentGameEntry, MonthlyTemplateRotation, MonthlyTemplateRotationMonth
+from wlct.tournaments import TournamentGame, Tournament, TournamentRound, find_tournament_by_id, TournamentGameEntry, MonthlyTemplateRotation, MonthlyTemplateRotationMonth, bump_changed_tournament_versions
 from django.conf import settings
 from wlct.api import API
 from django import db
@@ -100,6 +100,8 @@ def check_games():
                 finally:
                     child_tournament[0].update_in_progress = False
                     child_tournament[0].save()
+                    # everything this tournament's pass saved moves its version once
+                    bump_changed_tournament_versions()
             gc.collect()
 
 def cleanup_logs():
@@ -190,6 +192,7 @@ def tournament_engine():
         log_exception()
     finally:
         print("Engine done running....waiting until next run")
+        bump_changed_tournament_versions()
         engine.last_run_time = timezone.now()
         engine.next_run_time = timezone.now() + datetime.timedelta(seconds=get_run_time())
         engine.save()
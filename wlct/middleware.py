@@ -0,0 +1,13 @@
+from wlct.tournaments import bump_changed_tournament_versions
+
+class TournamentVersionMiddleware():
+    # tournaments changed while handling the request get their new version before the response goes out,
+    # so the page that made the change sees it on its next refresh
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            bump_changed_tournament_versions()
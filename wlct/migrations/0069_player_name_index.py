@@ -0,0 +1,30 @@
+# Generated by Django 2.1.4 on 2020-02-10 18:02
+
+from django.db import migrations, models
+
+
+def create_name_prefix_index(apps, schema_editor):
+    # invite search filters with name__istartswith, which postgres can only serve from an index on UPPER(name)
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE INDEX IF NOT EXISTS wlct_player_name_upper_like ON wlct_player (UPPER(name::text) text_pattern_ops)')
+
+
+def drop_name_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS wlct_player_name_upper_like')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wlct', '0068_player_link_mention'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='player',
+            name='name',
+            field=models.CharField(db_index=True, default='missing no', max_length=64),
+        ),
+        migrations.RunPython(create_name_prefix_index, drop_name_prefix_index),
+    ]
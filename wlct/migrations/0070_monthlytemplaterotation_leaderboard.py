@@ -0,0 +1,18 @@
+# Generated by Django 2.1.4 on 2020-02-10 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wlct', '0069_player_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monthlytemplaterotation',
+            name='leaderboard',
+            field=models.TextField(blank=True, default='', null=True),
+        ),
+    ]
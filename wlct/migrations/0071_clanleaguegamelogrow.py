@@ -0,0 +1,25 @@
+# Generated by Django 2.1.4 on 2020-02-11 16:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wlct', '0070_monthlytemplaterotation_leaderboard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClanLeagueGameLogRow',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(default='', max_length=255)),
+                ('is_finished', models.BooleanField(default=False)),
+                ('row', models.TextField(default='')),
+                ('game', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='clan_league_log_row', to='wlct.TournamentGame')),
+                ('league', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='wlct.ClanLeague')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.1.4 on 2020-02-13 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wlct', '0071_clanleaguegamelogrow'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seededtournament',
+            name='bracket_version',
+            field=models.CharField(blank=True, default='', max_length=32, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.1.4 on 2020-02-14 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wlct', '0072_seededtournament_bracket_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clanleague',
+            name='standings_seeded',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,3 +1,98 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from wlct.models import Player, Clan
+from wlct.tournaments import SwissTournament, TournamentRound, TournamentTeam, TournamentPlayer, TournamentGame, TournamentGameEntry, \
+    ClanLeague, ClanLeagueDivision, ClanLeagueDivisionClan, ClanLeagueTournament
 
 # Create your tests here.
+
+# the fragment cache lives in redis or the database in production, keep it in memory here so only
+# the queries the renderer itself makes are counted
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                           'versions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'versions'}})
+class SwissBracketQueryTests(TestCase):
+    def create_swiss_tournament(self, number_teams, number_rounds):
+        host = Player.objects.create(token="host", name="host")
+        clan = Clan.objects.create(name="clan")
+        tournament = SwissTournament.objects.create(name="swiss", created_by=host, has_started=True, template_settings="")
+
+        teams = []
+        for i in range(number_teams):
+            player = Player.objects.create(token="{}".format(i), name="player {}".format(i), clan=clan)
+            team = TournamentTeam.objects.create(tournament=tournament)
+            TournamentPlayer.objects.create(tournament=tournament, team=team, player=player)
+            teams.append(team)
+
+        for round_number in range(1, number_rounds + 1):
+            tournament_round = TournamentRound.objects.create(tournament=tournament, round_number=round_number)
+            for i in range(0, number_teams, 2):
+                TournamentGame.objects.create(tournament=tournament, round=tournament_round, teams="{}.{}".format(teams[i].id, teams[i+1].id), is_finished=True, winning_team=teams[i])
+        return tournament
+
+    def count_bracket_queries(self, tournament):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            tournament.update_bracket_game_data()
+        return len(context.captured_queries)
+
+    def test_bracket_queries_do_not_grow(self):
+        small_queries = self.count_bracket_queries(self.create_swiss_tournament(4, 2))
+        large_queries = self.count_bracket_queries(self.create_swiss_tournament(16, 4))
+        self.assertEqual(small_queries, large_queries)
+
+    def test_bracket_shows_results(self):
+        tournament = self.create_swiss_tournament(4, 1)
+        tournament.update_bracket_game_data()
+        self.assertEqual(tournament.bracket_game_data.count('text-success'), 2)
+        self.assertEqual(tournament.bracket_game_data.count('text-danger'), 2)
+        self.assertIn('player 3', tournament.bracket_game_data)
+
+class ClanLeagueStandingsTests(TestCase):
+    def create_clan_league(self, number_clans, players_per_team):
+        host = Player.objects.create(token="host", name="host")
+        league = ClanLeague.objects.create(name="league", created_by=host, has_started=True, template_settings="")
+        division = ClanLeagueDivision.objects.create(title="division", league=league)
+        tournament = ClanLeagueTournament.objects.create(name="template", created_by=host, template_settings="", division=division,
+                                                         parent_tournament=league, players_per_team=players_per_team)
+        TournamentRound.objects.create(tournament=tournament, round_number=1)
+        teams = []
+        for i in range(number_clans):
+            dclan = ClanLeagueDivisionClan.objects.create(division=division, clan=Clan.objects.create(name="clan {}".format(i)))
+            teams.append(TournamentTeam.objects.create(tournament=league, round_robin_tournament=tournament, clan_league_clan=dclan))
+        return league, tournament, teams
+
+    def finish_game(self, tournament, winning_team, losing_team):
+        tournament_round = TournamentRound.objects.get(tournament=tournament)
+        game = TournamentGame.objects.create(tournament=tournament, round=tournament_round, teams="{}.{}".format(winning_team.id, losing_team.id), is_finished=True, winning_team=winning_team)
+        TournamentGameEntry.objects.create(tournament=tournament, game=game, team=winning_team, team_opp=losing_team, is_finished=True)
+        TournamentGameEntry.objects.create(tournament=tournament, game=game, team=losing_team, team_opp=winning_team, is_finished=True)
+        tournament.game_finished(game, winning_team, losing_team)
+
+    def get_standings(self, league):
+        return list(ClanLeagueDivisionClan.objects.filter(division__league=league).order_by('id').values_list('total_points', 'max_points_possible'))
+
+    def test_game_finished_matches_rebuild(self):
+        league, tournament, teams = self.create_clan_league(4, 2)
+        league.rebuild_standings()
+        self.finish_game(tournament, teams[0], teams[1])
+        self.finish_game(tournament, teams[0], teams[2])
+        self.finish_game(tournament, teams[3], teams[0])
+        self.finish_game(tournament, teams[2], teams[1])
+        self.finish_game(tournament, teams[3], teams[1])
+        incremental = self.get_standings(league)
+        league.rebuild_standings()
+        self.assertEqual(incremental, self.get_standings(league))
+        # the clan that lost all of its games
+        self.assertEqual(incremental[1], (0, 0))
+
+    def test_standings_seeded_once(self):
+        league, tournament, teams = self.create_clan_league(2, 1)
+        league.process_new_games()
+        self.assertTrue(ClanLeague.objects.get(pk=league.pk).standings_seeded)
+        # a clan that lost every game is left at zero and possible zero, that alone mustn't trigger a recount
+        self.finish_game(tournament, teams[0], teams[1])
+        with CaptureQueriesContext(connection) as context:
+            league.process_new_games()
+        self.assertEqual(len(context.captured_queries), 0)
@@ -12,6 +12,9 @@ from wlct.api import API
 from collections import defaultdict
 import json
 import math
+import uuid
+import hashlib
+import threading
 import itertools
 from copy import copy
 import pickle
@@ -19,6 +22,11 @@ from dateutil.relativedelta import relativedelta as rd
 from django.utils import timezone
 import pytz
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.cache import cache, caches
+from django.utils.html import escape
+from django.db import transaction
+from django.db.models import F, Q, Sum, Count
+from wlct.events import emit_event, emit_tournament_event
 
 def is_player_allowed_join(request_player, templateid):
     # get the api to check to see if we can display join buttons
@@ -130,8 +138,10 @@ def add_open_slot(team_index, player_index, players_per_team, allow_buttons, log
     return table
 
 def get_team_data_no_clan(team):
+    return get_players_data_no_clan(TournamentPlayer.objects.filter(team=team).select_related('player'))
+
+def get_players_data_no_clan(tournament_players):
     team_data = ""
-    tournament_players = TournamentPlayer.objects.filter(team=team)
     for tournament_player in tournament_players:
         team_data += '{} '.format(tournament_player.player.name)
     return team_data
@@ -140,15 +150,105 @@ def get_matchup_data(team1, team2):
     data = '<table><tr><td>{}</td><td>{}</td></tr></table>'.format(get_team_data(team1), get_team_data(team2))
     return data
 
-def get_team_data_impl(team, sameline):
+def get_players_data(tournament_players, sameline):
     team_data = ""
-    tournament_players = TournamentPlayer.objects.filter(team=team)
     for tournament_player in tournament_players:
         team_data += get_player_data(tournament_player)
         if not sameline:
             team_data += "<br/>"
     return team_data
 
+def get_team_data_impl(team, sameline):
+    return get_players_data(TournamentPlayer.objects.filter(team=team).select_related('player__clan'), sameline)
+
+def get_team_players(tournament, **filters):
+    # every player in the tournament with their clan in one query, grouped by team id
+    team_players = defaultdict(list)
+    for tournament_player in TournamentPlayer.objects.filter(tournament=tournament, **filters).select_related('player__clan'):
+        team_players[tournament_player.team_id].append(tournament_player)
+    return team_players
+
+def get_players_fragment_key(tournament_players):
+    # the rendered players show their names and clans, so a rename or clan change has to make a new key too
+    players = ["{}:{}:{}:{}:{}".format(tournament_player.player.id, tournament_player.player.name, tournament_player.player.clan_id,
+        tournament_player.player.clan.name if tournament_player.player.clan else "", tournament_player.player.clan.image_path if tournament_player.player.clan else "")
+        for tournament_player in tournament_players]
+    return hashlib.md5("|".join(players).encode('utf-8')).hexdigest()
+
+def get_cached_fragments(items, get_key, render):
+    # fragments are keyed by the version of the object they render, so a changed object gets a new key
+    # look them all up in one round trip and only render the ones we don't have yet
+    keys = [get_key(item) for item in items]
+    fragments = cache.get_many(keys)
+    rendered = {}
+    for key, item in zip(keys, items):
+        if key not in fragments and key not in rendered:
+            rendered[key] = render(item)
+    if len(rendered) > 0:
+        cache.set_many(rendered)
+        fragments.update(rendered)
+    return ''.join(fragments[key] for key in keys)
+
+def get_player_game_summary_key(player_id, tournament_id=None):
+    # counts over all of the player's games, or only their games in one tournament
+    if tournament_id is None:
+        return "player_games:{}".format(player_id)
+    return "player_games:{}:{}".format(player_id, tournament_id)
+
+def invalidate_player_game_summaries(team_ids, tournament_id):
+    # the game counts of everyone on these teams are out of date once one of their games is created or finishes,
+    # both overall and in the tournament the game belongs to
+    player_ids = TournamentPlayer.objects.filter(team_id__in=team_ids).values_list('player_id', flat=True)
+    keys = []
+    for player_id in player_ids:
+        keys.append(get_player_game_summary_key(player_id))
+        keys.append(get_player_game_summary_key(player_id, tournament_id))
+    cache.delete_many(keys)
+
+def get_player_game_entries(player, status=None, tournament_id=None):
+    # every game entry of every team the player was on, newest first, in one query
+    entries = TournamentGameEntry.objects.filter(team__tournamentplayer__player=player).select_related('game', 'tournament').order_by('-id')
+    if status == "in_progress":
+        entries = entries.filter(game__is_finished=False)
+    elif status == "won":
+        entries = entries.filter(game__is_finished=True, game__winning_team_id=F('team_id'))
+    elif status == "lost":
+        entries = entries.filter(game__is_finished=True).exclude(game__winning_team_id=F('team_id'))
+    if tournament_id is not None:
+        entries = entries.filter(tournament_id=tournament_id)
+    return entries
+
+def get_player_game_summary(player, tournament_id=None):
+    key = get_player_game_summary_key(player.id, tournament_id)
+    summary = cache.get(key)
+    if summary is None:
+        summary = get_player_game_entries(player, tournament_id=tournament_id).order_by().aggregate(
+            in_progress=Count('id', filter=Q(game__is_finished=False)),
+            won=Count('id', filter=Q(game__is_finished=True, game__winning_team_id=F('team_id'))),
+            total=Count('id'))
+        summary['lost'] = summary['total'] - summary['won'] - summary['in_progress']
+        cache.set(key, summary)
+    return summary
+
+def get_player_games_page(player, status=None, tournament_id=None, after=None, page_size=50):
+    # one page of the player's games after the entry id the last page ended on, with the players of
+    # both teams in every game loaded in one more query
+    entries = get_player_game_entries(player, status, tournament_id)
+    if after is not None:
+        entries = entries.filter(id__lt=after)
+    entries = list(entries[:page_size + 1])
+    has_more = len(entries) > page_size
+    entries = entries[:page_size]
+
+    team_ids = set()
+    for entry in entries:
+        team_ids.add(entry.team_id)
+        team_ids.add(entry.team_opp_id)
+    team_players = defaultdict(list)
+    for tournament_player in TournamentPlayer.objects.filter(team_id__in=team_ids).select_related('player__clan'):
+        team_players[tournament_player.team_id].append(tournament_player)
+    return entries, team_players, has_more
+
 def get_team_data_sameline(team):
     return get_team_data_impl(team, True)
 
@@ -275,6 +375,36 @@ def find_tournament_by_id(id, query_all=False):
 
     return None
 
+# the reverse links from a tournament row to its subclass, in the same order as find_tournament_by_id
+tournament_types = [
+    ('swisstournament', 'swiss'),
+    ('seededtournament', 'seeded'),
+    ('groupstagetournament', 'group_stage'),
+    ('roundrobintournament__clanleaguetournament', 'clan_league_tournament'),
+    ('roundrobintournament', 'round_robin'),
+    ('realtimeladder', 'real_time_ladder'),
+    ('promotionalrelegationleague', 'promotion_relegation_league'),
+    ('promotionalrelegationleagueseason', 'promotion_relegation_league_season'),
+    ('monthlytemplaterotation', 'monthly_template_circuit'),
+    ('clanleague', 'clan_league'),
+]
+
+def get_tournament_type(tournament):
+    # walks the subclass links loaded with select_related, a missing subclass was cached as missing so
+    # none of this queries
+    for accessor, type_name in tournament_types:
+        try:
+            child = tournament
+            for name in accessor.split('__'):
+                child = getattr(child, name)
+            return type_name
+        except ObjectDoesNotExist:
+            continue
+    return 'tournament'
+
+def get_tournaments_with_types():
+    return Tournament.objects.select_related('created_by', *[accessor for accessor, type_name in tournament_types])
+
 
 def find_tournament_public(id):
     try:
@@ -296,6 +426,81 @@ def find_tournament_public(id):
 
     return None
 
+def get_open_listing_key():
+    return "open_listing"
+
+def invalidate_open_listing():
+    cache.delete(get_open_listing_key())
+
+def get_tournament_version_key(tournament_id):
+    return "tournament_version:{}".format(tournament_id)
+
+def get_tournament_version(tournament_id):
+    # the version lives in the shared cache rather than on the tournament row so a stale tournament saved
+    # later in an engine pass can never move it back. a lost version just makes clients fetch everything once
+    version = caches['versions'].get(get_tournament_version_key(tournament_id))
+    if version is None:
+        # only tournaments that exist get a version, so asking about made up ids can't fill the cache. nothing
+        # changed to make this one, so it expires with the cache's default timeout
+        if not str(tournament_id).isnumeric() or not Tournament.objects.filter(pk=tournament_id).exists():
+            return ""
+        version = uuid.uuid4().hex
+        caches['versions'].set(get_tournament_version_key(tournament_id), version)
+    return version
+
+def bump_tournament_version(tournament_id):
+    version = uuid.uuid4().hex
+    caches['versions'].set(get_tournament_version_key(tournament_id), version, None)
+    return version
+
+# tournaments whose teams, players or invites were saved by this thread and haven't had their version moved yet.
+# an engine pass or a request can save hundreds of rows, each tournament's version is written once when it's done
+changed_tournaments = threading.local()
+
+def mark_tournament_changed(tournament_id):
+    if tournament_id is None:
+        return
+    if not hasattr(changed_tournaments, 'ids'):
+        changed_tournaments.ids = set()
+    changed_tournaments.ids.add(tournament_id)
+
+def bump_changed_tournament_versions():
+    # called at the end of every engine pass, request and bot query, and before any event goes out so a page
+    # that refreshes when it hears the event sees the new version
+    tournament_ids = getattr(changed_tournaments, 'ids', None)
+    if tournament_ids:
+        changed_tournaments.ids = set()
+        caches['versions'].set_many({get_tournament_version_key(tournament_id): uuid.uuid4().hex for tournament_id in tournament_ids}, None)
+
+def get_player_allowed_join(player, templateid):
+    # the template check is a call to warzone, remember the answer for a while for pages that refresh often
+    if player is None:
+        return False
+    key = "allowed_join:{}:{}".format(player.id, templateid)
+    allowed_join = cache.get(key)
+    if allowed_join is None:
+        allowed_join = is_player_allowed_join(player, templateid)
+        cache.set(key, allowed_join, 600)
+    return allowed_join
+
+def get_open_tournaments():
+    # one query per tournament type, a tournament that matches more than one type (clan league tournaments are
+    # round robins too) is resolved in the same order as find_tournament_by_id
+    tournaments = {}
+    for tournament_type in [SwissTournament, SeededTournament, GroupStageTournament, ClanLeagueTournament, RoundRobinTournament, RealTimeLadder]:
+        for tournament in tournament_type.objects.filter(private=False, is_finished=False, has_started=False).select_related('created_by__clan'):
+            if tournament.id not in tournaments:
+                tournaments[tournament.id] = tournament
+    return sorted(tournaments.values(), key=lambda tournament: tournament.created_date, reverse=True)
+
+def get_open_leagues():
+    leagues = {}
+    for league_type in [PromotionalRelegationLeague, MonthlyTemplateRotation, ClanLeague]:
+        for league in league_type.objects.filter(private=False, is_finished=False, is_league=True).select_related('created_by__clan'):
+            if league.id not in leagues:
+                leagues[league.id] = league
+    return sorted(leagues.values(), key=lambda league: (not league.is_official, -league.created_date.timestamp()))
+
 
 class Tournament(models.Model):
     name = models.CharField(max_length=128, null=True)
@@ -326,6 +531,40 @@ class Tournament(models.Model):
     is_official = models.BooleanField(default=False)
     vacation_force_interval = 20
 
+    # fields shown in the open tournament listing, which is rebuilt when one of them changes
+    listing_fields = ['name', 'description', 'private', 'has_started', 'is_finished', 'is_league', 'is_official', 'max_players', 'number_players', 'players_per_team', 'template', 'multi_day']
+
+    # everything else the tournament page shows, the page's data version moves when any of these change
+    version_fields = ['bracket_game_data', 'game_log', 'game_creation_allowed', 'start_locked', 'winning_team_id']
+
+    def __init__(self, *args, **kwargs):
+        super(Tournament, self).__init__(*args, **kwargs)
+        self.loaded_values = self.get_field_values()
+
+    def get_field_values(self):
+        # only look at fields that are loaded so deferred fields are never fetched here
+        return {field: self.__dict__.get(field) for field in self.listing_fields + self.version_fields}
+
+    def has_changed(self, fields):
+        values = self.get_field_values()
+        return any(values[field] != self.loaded_values[field] for field in fields)
+
+    def save(self, *args, **kwargs):
+        listing_changed = self.pk is None or self.has_changed(self.listing_fields)
+        version_changed = listing_changed or self.has_changed(self.version_fields)
+        super(Tournament, self).save(*args, **kwargs)
+        if listing_changed:
+            invalidate_open_listing()
+        if version_changed:
+            mark_tournament_changed(self.id)
+            bump_changed_tournament_versions()
+            emit_tournament_event(self, "tournament_updated")
+        self.loaded_values = self.get_field_values()
+
+    def delete(self, *args, **kwargs):
+        invalidate_open_listing()
+        return super(Tournament, self).delete(*args, **kwargs)
+
     def player_data_in_name(self):
         return False
 
@@ -446,6 +685,8 @@ class Tournament(models.Model):
                                              team_game=team_game, tournament=self, round=tournament_round,
                                              teams=game)
             tournament_game.save_with_entry()
+            bump_changed_tournament_versions()
+            emit_tournament_event(self, "game_created", game=tournament_game.id, teams=game)
             log_game(
                 "Game {} created in tournament {}. Teams: {}, gameID: {}, round: {}".format(gameID, self.id,
                                                                                             game, gameID,
@@ -466,39 +707,56 @@ class Tournament(models.Model):
         else:
             return "WZClot Tournament Game"
 
+    invite_search_page_size = 25
+
+    def get_invite_candidates_queryset(self, creator_token, viewer_token):
+        # everyone who hasn't been invited to or joined the tournament, the creator and viewer are left out as well
+        invited = TournamentInvite.objects.filter(tournament=self.id, joined=False).values('player')
+        joined = TournamentPlayer.objects.filter(tournament=self.id).values('player')
+        return Player.objects.exclude(id__in=invited).exclude(id__in=joined).exclude(token__in=[creator_token, viewer_token])
+
+    def get_invite_candidates(self, creator_token, request_data, viewer_token):
+        # a single anti-join query for the next page of players whose name starts with the search text
+        # we grab one extra player to know if there is another page after this one
+        players = self.get_invite_candidates_queryset(creator_token, viewer_token).filter(name__istartswith=request_data.get('q', '').strip())
+        if request_data.get('after_id', '').isnumeric():
+            players = players.filter(Q(name__gt=request_data.get('after_name', '')) | Q(name=request_data.get('after_name', ''), id__gt=int(request_data['after_id'])))
+        return list(players.select_related('clan').order_by('name', 'id')[:self.invite_search_page_size + 1])
+
+    def get_invite_button(self, player, request_data):
+        return '<td><button class="btn btn-primary" name="slot" id="invite-{}">+</button></td>'.format(player.token)
+
+    def get_invite_candidates_rows(self, creator_token, request_data, viewer_token):
+        # returns the rows for one page of the search along with the button to load the next page
+        players = self.get_invite_candidates(creator_token, request_data, viewer_token)
+        rows = ''
+        for player in players[:self.invite_search_page_size]:
+            rows += '<tr><td>'
+            if player.clan is not None:
+                rows += '<a href="https://warzone.com{}" target="_blank"><img src="{}" alt="{}" /></a>'.format(
+                    player.clan.icon_link, player.clan.image_path, player.clan.name)
+
+            rows += '<a href="https://warzone.com/Profile?p={}" target="_blank"><span class="invite_name">{}</span></a>'.format(
+                player.token, player.name)
+            rows += '</td>'
+            rows += self.get_invite_button(player, request_data)
+            rows += '</tr>'
+
+        if len(players) > self.invite_search_page_size:
+            last_player = players[self.invite_search_page_size - 1]
+            rows += '<tr id="invite-search-more-row"><td colspan="2"><button class="btn btn-secondary btn-sm" id="invite-search-more" data-after-name="{}" data-after-id="{}">More Players</button></td></tr>'.format(
+                escape(last_player.name), last_player.id)
+        elif len(players) == 0 and 'after_id' not in request_data:
+            rows += '<tr><td colspan="2">There are no players to invite.</td></tr>'
+
+        return rows
+
     def get_invited_players_inverse_table(self, creator_token, request_data, viewer_token):
-        # get all the players, and only add the players we care about (excluding invited players) to the html
-        table = '<div class="row"><input type="text" id="invite-filter" placeholder="Filter Players" /></div>'
+        # only the first page of players is sent down, the rest are searched for by name as the creator types
+        table = '<div class="row"><input type="text" id="invite-filter" placeholder="Search Players" value="{}" /></div>'.format(escape(request_data.get('q', '')))
         table += '<table class="table table-hover">'
         table += '<thead><tr><th>Player Name</th><th> </th></tr></thead><tbody id="invite-filter-table">'
-
-        is_player_available = False
-        players = Player.objects.all()
-        # list of player names associated with the rows so that we can do easy filtering on the client
-        # side
-        for player in players:
-            invite = TournamentInvite.objects.filter(tournament=self.id, player=player, joined=False)
-            tournament_player = TournamentPlayer.objects.filter(tournament=self.id, player=player)
-            if not invite and not tournament_player:
-                is_player_available = True
-                # player wasn't invited to this tournament
-                # check if it's us, if it is, skip
-                if player.token != viewer_token and player.token != creator_token:
-                    table += '<tr><td>'
-                    if player.clan is not None:
-                        table += '<a href="https://warzone.com{}" target="_blank"><img src="{}" alt="{}" /></a>'.format(
-                            player.clan.icon_link, player.clan.image_path, player.clan.name)
-
-                    table += '<a href="https://warzone.com/Profile?p={}" target="_blank"><span class="invite_name">{}</span></a>'.format(
-                        player.token, player.name)
-                    table += '</td>'
-                    table += '<td><button class="btn btn-primary" name="slot" id="invite-{}">+</button></td>'.format(
-                        player.token)
-                    table += '</tr>'
-
-        if not is_player_available:
-            table += 'There are no players to invite.'
-
+        table += self.get_invite_candidates_rows(creator_token, request_data, viewer_token)
         table += '</tbody></table>'
 
         return table
@@ -582,12 +840,17 @@ class Tournament(models.Model):
         elif self.start_locked:
             allow_buttons = False  # hard override
 
+        # the teams and their players are loaded once, everything about the viewer is worked out from them
+        tournamentteams = list(TournamentTeam.objects.filter(tournament=self.id).order_by('-wins', 'team_index'))
+        players_by_team = get_team_players(self)
+
         in_tournament = False
-        tournament_player = TournamentPlayer.objects.filter(player=request_player, tournament=self.id)
-        if tournament_player:
-            in_tournament = True
+        if request_player is not None:
+            for team_players in players_by_team.values():
+                for player in team_players:
+                    if player.player_id == request_player.id:
+                        in_tournament = True
 
-        tournamentteams = TournamentTeam.objects.filter(tournament=self.id).order_by('-wins', 'team_index')
         if tournamentteams:
             table += '<table class="table table-hover">'
             if self.has_started:
@@ -597,7 +860,7 @@ class Tournament(models.Model):
                     table += "<tr><td><b>Team {} </b></td></tr>".format(team.team_index)
 
                 total_players = 0
-                team_players = TournamentPlayer.objects.filter(team=team)
+                team_players = players_by_team[team.id]
                 if team_players:
                     for player in team_players:
                         table += '<tr><td>'
@@ -885,6 +1148,9 @@ class Tournament(models.Model):
                             tourney_team_lost.losses += 1
                             tourney_team_lost.buchholz += tourney_team.buchholz
                             tourney_team_lost.save()
+                            self.game_finished(game, tourney_team, tourney_team_lost)
+                            bump_changed_tournament_versions()
+                            emit_tournament_event(self, "game_finished", game=game.id, winning_team=tourney_team.id, losing_team=tourney_team_lost.id)
                     else:
                         processGameLog += "Could not find a losing team when processing game...??"
         except Exception:
@@ -893,6 +1159,11 @@ class Tournament(models.Model):
             pgl = ProcessGameLog(game=game, msg=processGameLog)
             pgl.save()
 
+    def game_finished(self, game, winning_team, losing_team):
+        # called once a game has a result and both teams have been updated
+        # tournaments that keep running totals override this
+        pass
+
     def get_tournament_logs(self):
         return self.tournament_logs
 
@@ -1325,6 +1596,16 @@ class SwissTournament(Tournament):
             # build the table
             max_games_per_row = 4
             tournament_rounds = TournamentRound.objects.filter(tournament=self.id).order_by('round_number')
+
+            # load every game and player up front so the number of queries doesn't grow with the tournament
+            round_games = defaultdict(list)
+            for game in TournamentGame.objects.filter(tournament=self.id).order_by('id'):
+                round_games[game.round_id].append(game)
+
+            team_players = defaultdict(list)
+            for tournament_player in TournamentPlayer.objects.filter(tournament=self.id).select_related('player__clan'):
+                team_players[tournament_player.team_id].append(tournament_player)
+
             for round in tournament_rounds:
                 bracket_game_data += '<br/><div class="card gedf-card span12">'
                 bracket_game_data += '<div class="card-header h7">'
@@ -1334,37 +1615,9 @@ class SwissTournament(Tournament):
                 bracket_game_data += '<div class="container">'
                 bracket_game_data += '<div class="row">'
                 # grab the games in this round, we don't care about the status
-                tournament_games = TournamentGame.objects.filter(round=round, tournament=self.id)
-                num_games = 1
-                for game in tournament_games:
-                    bracket_game_data += '<div class="col-md-3 col-lg-3 col-xl-3 col-xs-3"><table class="table table-hover table-bordered" style="font-size:12px;">'
-                    # add the game link with rowspan = 2
-                    teams = game.teams.split('.')
-                    num_teams = 1
-                    for team in teams:
-                        bracket_game_data += '<tr>'
-                        if num_teams == 1:
-                            bracket_game_data += '<td rowspan="2" class="align-middle"><a href="{}" target="_blank">Game Link</a></td>'.format(game.game_link)
-                            num_teams = 0  # just so we don't do this again
-                        bracket_game_data += '<td class="col-md-9 col-lg-9 col-xl-9 col-xs-9">'
-                        tournament_players = TournamentPlayer.objects.filter(team=int(team))
-                        for tournament_player in tournament_players:
-                            if tournament_player.player.clan is not None:
-                                bracket_game_data += '<a href="https://warzone.com{}" target="_blank"><img src="{}" alt="{}" /></a> '.format(
-                                    tournament_player.player.clan.icon_link, tournament_player.player.clan.image_path, tournament_player.player.clan.name)
-
-                            bracket_game_data += '<a href="https://warzone.com/Profile?p={}" target="_blank">{}</a>&nbsp;'.format(
-                            tournament_player.player.token, tournament_player.player.name)
-                            if game.is_finished and game.winning_team is not None:
-                                if team == str(game.winning_team.id):
-                                    bracket_game_data += '<span class="text-success">W</span>'
-                                else:
-                                    bracket_game_data += '<span class="text-danger">L</span>'
-
-                        bracket_game_data += '</td></tr>'
-
-                    bracket_game_data += '</table></div>'
-                    num_games += 1
+                tournament_games = round_games[round.id]
+                bracket_game_data += get_cached_fragments(tournament_games, lambda game: game.get_fragment_key('swiss_card', [tournament_player for team in game.teams.split('.') for tournament_player in team_players[int(team)]]), lambda game: self.get_game_card(game, team_players))
+                num_games = len(tournament_games) + 1
 
                 while num_games < (max_games_per_row + 1):
                     bracket_game_data += '<div class="col-md-3 col-lg-3 col-xl-3 col-xs-3"></div>'
@@ -1375,6 +1628,35 @@ class SwissTournament(Tournament):
         self.bracket_game_data = bracket_game_data
         self.save()
 
+    def get_game_card(self, game, team_players):
+        card = '<div class="col-md-3 col-lg-3 col-xl-3 col-xs-3"><table class="table table-hover table-bordered" style="font-size:12px;">'
+        # add the game link with rowspan = 2
+        teams = game.teams.split('.')
+        num_teams = 1
+        for team in teams:
+            card += '<tr>'
+            if num_teams == 1:
+                card += '<td rowspan="2" class="align-middle"><a href="{}" target="_blank">Game Link</a></td>'.format(game.game_link)
+                num_teams = 0  # just so we don't do this again
+            card += '<td class="col-md-9 col-lg-9 col-xl-9 col-xs-9">'
+            for tournament_player in team_players[int(team)]:
+                if tournament_player.player.clan is not None:
+                    card += '<a href="https://warzone.com{}" target="_blank"><img src="{}" alt="{}" /></a> '.format(
+                        tournament_player.player.clan.icon_link, tournament_player.player.clan.image_path, tournament_player.player.clan.name)
+
+                card += '<a href="https://warzone.com/Profile?p={}" target="_blank">{}</a>&nbsp;'.format(
+                tournament_player.player.token, tournament_player.player.name)
+                if game.is_finished and game.winning_team_id is not None:
+                    if team == str(game.winning_team_id):
+                        card += '<span class="text-success">W</span>'
+                    else:
+                        card += '<span class="text-danger">L</span>'
+
+            card += '</td></tr>'
+
+        card += '</table></div>'
+        return card
+
     def get_start_locked_data(self):
         # returns the html for the tournament
         if self.current_filled_teams >= self.min_teams:
@@ -1440,6 +1722,7 @@ class SwissTournament(Tournament):
 
 class SeededTournament(Tournament):
     type = models.CharField(max_length=255, default="Seeded")
+    bracket_version = models.CharField(max_length=32, blank=True, null=True, default="")
     min_teams = 4
 
     @property
@@ -1448,89 +1731,99 @@ class SeededTournament(Tournament):
 
     def start(self, tournament_data):
         try:
-            # start the tournament calculating the max_rounds again based on the number of players
-            # in the tournament
-            #
-            # the tournament can be started once the minimum # of players have joined, so recalculate
-            # set the common parent settings
-            super(SeededTournament, self).start()
-
-            self.number_rounds = self.current_rounds
-            log("Starting Seeded tournament id: {} name: {} players: {} rounds: {}".format(self.id, self.name,
-                                                                                          self.number_players,
-                                                                                          self.current_rounds),
-                LogLevel.informational)
-
-            seed_team_list = tournament_data.split(';')
-            team_list = []
-            for seeded_team in seed_team_list:
-                split_data = seeded_team.split('.')
-                team_list.append(split_data[1])
-                tournament_team1 = TournamentTeam.objects.filter(tournament=self, pk=split_data[1])
-                if tournament_team1:
-                    tournament_team1[0].seed = int(split_data[0])
-                    tournament_team1[0].save()
-
-            total_teams = int(self.number_players / self.players_per_team)
-
-            # build the seed list, which is the order in which games are created and saved,
-            # so subsequent rounds will match-up the correct teams together
-            seed_list = get_seed_list(self.max_teams)
-
-            print("Seed list: {}".format(seed_list))
-            print("Team list: {}".format(team_list))
-            # now, loop through the seed list, pairing up the teams in this order
-            game_data_grid = ""
-            game_data = ""
-            team_to_add = 1  # can only be 1 or two, we're either adding the first team or the second
-            for i in range(0, len(seed_list)):
-                index = seed_list[i] - 1
-                if team_to_add % 2 == 0:
-                    # second team
-                    game_data += ".{};".format(team_list[index])
-                    game_data_grid += game_data
-                    game_data = ""  # reset
-                else:
-                    # first team
-                    game_data += "{}".format(team_list[index])
+            self.create_rounds(tournament_data)
 
-                team_to_add += 1
+            # we need to create initial games here, as the engine might not run for a while (we just missed it)
+            self.create_first_round_games()
+        except Exception:
+            log_exception()
 
-            print("Starting game data grid: {}".format(game_data_grid))
+    def create_rounds(self, tournament_data):
+        # start the tournament calculating the max_rounds again based on the number of players
+        # in the tournament
+        #
+        # the tournament can be started once the minimum # of players have joined, so recalculate
+        # set the common parent settings
+        super(SeededTournament, self).start()
 
-            # create the rounds
-            games_in_round = total_teams
-            for i in range(1, self.number_rounds + 1):
-                # create a new round
-                # construct the game list by looping through all the players and putting the first two together, second two, and so forth
-                # we only know the games on the very first go at it
+        self.number_rounds = self.current_rounds
+        log("Starting Seeded tournament id: {} name: {} players: {} rounds: {}".format(self.id, self.name,
+                                                                                      self.number_players,
+                                                                                      self.current_rounds),
+            LogLevel.informational)
+
+        seed_team_list = tournament_data.split(';')
+        team_list = []
+        for seeded_team in seed_team_list:
+            split_data = seeded_team.split('.')
+            team_list.append(split_data[1])
+            tournament_team1 = TournamentTeam.objects.filter(tournament=self, pk=split_data[1])
+            if tournament_team1:
+                tournament_team1[0].seed = int(split_data[0])
+                tournament_team1[0].save()
+
+        total_teams = int(self.number_players / self.players_per_team)
+
+        # build the seed list, which is the order in which games are created and saved,
+        # so subsequent rounds will match-up the correct teams together
+        seed_list = get_seed_list(self.max_teams)
+
+        print("Seed list: {}".format(seed_list))
+        print("Team list: {}".format(team_list))
+        # now, loop through the seed list, pairing up the teams in this order
+        game_data_grid = ""
+        game_data = ""
+        team_to_add = 1  # can only be 1 or two, we're either adding the first team or the second
+        for i in range(0, len(seed_list)):
+            index = seed_list[i] - 1
+            if team_to_add % 2 == 0:
+                # second team
+                game_data += ".{};".format(team_list[index])
+                game_data_grid += game_data
+                game_data = ""  # reset
+            else:
+                # first team
+                game_data += "{}".format(team_list[index])
+
+            team_to_add += 1
+
+        print("Starting game data grid: {}".format(game_data_grid))
+
+        # create the rounds
+        games_in_round = total_teams
+        for i in range(1, self.number_rounds + 1):
+            # create a new round
+            # construct the game list by looping through all the players and putting the first two together, second two, and so forth
+            # we only know the games on the very first go at it
+            game_data = ""
+            game_data_grid = game_data_grid[:-1]
+            game_data = game_data_grid
+            games_in_round = games_in_round / 2
+            if i > 1:
+                game_data_grid = ""
+                print("Processing neutral data for round {}".format(i))
                 game_data = ""
-                game_data_grid = game_data_grid[:-1]
-                game_data = game_data_grid
-                games_in_round = games_in_round / 2
-                if i > 1:
-                    game_data_grid = ""
-                    print("Processing neutral data for round {}".format(i))
-                    game_data = ""
-                    for j in range(0, int(games_in_round)):
-                        game_data += "{}.{};".format(0, 0)
-                    game_data = game_data[:-1]
-                print("Creating round {} with game data: {}".format(i, game_data))
-                tournament_round = TournamentRound(round_number=i, tournament=self, is_finished=False,
-                                                   games=game_data, number_games=games_in_round)
-                tournament_round.save()
+                for j in range(0, int(games_in_round)):
+                    game_data += "{}.{};".format(0, 0)
+                game_data = game_data[:-1]
+            print("Creating round {} with game data: {}".format(i, game_data))
+            tournament_round = TournamentRound(round_number=i, tournament=self, is_finished=False,
+                                               games=game_data, number_games=games_in_round)
+            tournament_round.save()
 
-            # we need to create initial games here, as the engine might not run for a while (we just missed it)
-            # get the game data back and parse it
-            tournament_round = TournamentRound.objects.filter(round_number=1, tournament=self)
-            if tournament_round:
-                tournament_round = tournament_round[0]
-                game_data = tournament_round.games.split(';')
-                for game in game_data:
-                    print("[StartGame]: Creating game {} in round {}".format(game, tournament_round.round_number))
-                    self.create_game(tournament_round, game)
-        except Exception:
-            log_exception()
+    def create_first_round_games(self):
+        # every first round match-up is known once the seeds are set, so create them all in one pass
+        # skipping any that already exist in case a previous pass failed part way through
+        tournament_round = TournamentRound.objects.filter(round_number=1, tournament=self)
+        if tournament_round:
+            tournament_round = tournament_round[0]
+            games_created = set(TournamentGame.objects.filter(tournament=self, round=tournament_round).values_list('teams', flat=True))
+            game_data = tournament_round.games.split(';')
+            for game in game_data:
+                if game in games_created:
+                    continue
+                print("[StartGame]: Creating game {} in round {}".format(game, tournament_round.round_number))
+                self.create_game(tournament_round, game)
 
     def process_new_games(self):
         # loop through the rounds, computing any new matchups for the next round if possible
@@ -1587,6 +1880,11 @@ class SeededTournament(Tournament):
                 print("All game have been created in round {}, continuing on".format(round.round_number))
                 continue
 
+            if round.round_number == 1:
+                # the first round is fully seeded, pick up any games that failed to create
+                self.create_first_round_games()
+                continue
+
             game_buckets_current_round = {}
             current_round_game_data = round.games.split(';')
 
@@ -1693,6 +1991,14 @@ class SeededTournament(Tournament):
         total_games = 0
         rounds = TournamentRound.objects.filter(tournament=self).order_by('round_number')
 
+        # every game and every player of the tournament in one query each, looked up by round and teams
+        games = {}
+        for game in TournamentGame.objects.filter(tournament=self):
+            games.setdefault((game.round_id, game.teams), game)
+        team_players = defaultdict(list)
+        for tournament_player in TournamentPlayer.objects.filter(tournament=self).select_related('player__clan', 'team'):
+            team_players[tournament_player.team_id].append(tournament_player)
+
         for round in rounds:
             # create the lists
             '''             
@@ -1716,10 +2022,10 @@ class SeededTournament(Tournament):
                     current_game_list = []
                     teams = game.split('.')
                     for team in teams:
-                        player_obj = TournamentPlayer.objects.filter(tournament=self, team=int(team))
+                        player_obj = team_players[int(team)]
                         if player_obj:
                             team_player = ""
-                            if player_obj.count() == 1:
+                            if len(player_obj) == 1:
                                 # store the player data as if we were to output, cause if this is a partial team
                                 # then we want to just continue on
                                 player_data = ""
@@ -1742,23 +2048,23 @@ class SeededTournament(Tournament):
             current_round_results = []
             for game in game_data:
                 current_game_result = []
-                game_obj = TournamentGame.objects.filter(tournament=self, round=round, teams=game)
-                if game_obj and game_obj[0].is_finished:
+                game_obj = games.get((round.id, game))
+                if game_obj and game_obj.is_finished:
                     # the game is finished, so add the resulting data
                     teams = game.split('.')
-                    if game_obj[0].winning_team.id == int(teams[0]):
+                    if game_obj.winning_team_id == int(teams[0]):
                         current_game_result.append(1)
                         current_game_result.append(0)
 
                     else:
                         current_game_result.append(0)
                         current_game_result.append(1)
-                    bracket_data['game_links'].append(game_obj[0].game_link)
+                    bracket_data['game_links'].append(game_obj.game_link)
                 else:
                     current_game_result.append(None)
                     current_game_result.append(None)
                     if game_obj:
-                        bracket_data['game_links'].append(game_obj[0].game_link)
+                        bracket_data['game_links'].append(game_obj.game_link)
                     else:
                         bracket_data['game_links'].append("javascript:void(0);")
 
@@ -1769,7 +2075,12 @@ class SeededTournament(Tournament):
                 current_round_results.append(current_game_result)
             bracket_data['bracket_data']['results'].append(current_round_results)
 
-        return json.dumps(bracket_data)
+        # keep the bracket on the tournament so the page reads one row, the version only moves when it changed
+        bracket_game_data = json.dumps(bracket_data)
+        if bracket_game_data != self.bracket_game_data:
+            self.bracket_game_data = bracket_game_data
+            self.bracket_version = hashlib.md5(bracket_game_data.encode('utf-8')).hexdigest()
+        return bracket_game_data
 
     def get_game_log(self):
         return self.game_log
@@ -1816,6 +2127,21 @@ class SeededTournament(Tournament):
 
 
 
+def get_group_place_key(team):
+    # round robins assign places when they finish, teams without one fall back to their record
+    if team.place > 0:
+        return (team.place, -team.wins, -team.buchholz)
+    return (math.inf, -team.wins, -team.buchholz)
+
+def get_knockout_opponents(top_half, bottom_half):
+    # rotate the bottom half until no first round game is between two teams from the same group
+    for offset in range(len(bottom_half)):
+        opponents = bottom_half[offset:] + bottom_half[:offset]
+        if all(top_half[i].group_id != opponents[i].group_id for i in range(min(len(top_half), len(opponents)))):
+            return opponents
+    # a rematch can't be avoided (a single group), keep the original order
+    return bottom_half
+
 class GroupStageTournament(Tournament):
     type = models.CharField(max_length=255, default="Group Stage")
     groups = models.IntegerField(default=4)
@@ -1881,8 +2207,36 @@ class GroupStageTournament(Tournament):
         return self.bracket_game_data
 
     def update_bracket_game_data(self):
-        bracket_game_data = ""
-        self.bracket_game_data = ""
+        # build the group tables and the knockout summary once here, page loads only read the cached html
+        bracket_game_data = '<div class="container"><div class="row">'
+
+        team_players = defaultdict(list)
+        for player in TournamentPlayer.objects.filter(tournament=self).select_related('player__clan'):
+            team_players[player.team_id].append(player)
+
+        group_teams = defaultdict(list)
+        for team in TournamentTeam.objects.filter(tournament=self, group__isnull=False).order_by('-wins', '-buchholz'):
+            group_teams[team.group_id].append(team)
+
+        groups = GroupStageTournamentGroup.objects.filter(tournament=self).order_by('group_number')
+        for group in groups:
+            bracket_game_data += '<table class="table table-hover table-condensed">'
+            bracket_game_data += '<tr><th>Group {}</th><th>Wins</th><th>Losses</th></tr>'.format(group.group_number)
+            for team in sorted(group_teams[group.id], key=get_group_place_key):
+                bracket_game_data += '<tr><td>'
+                for player in team_players[team.id]:
+                    bracket_game_data += get_player_data(player)
+                bracket_game_data += '</td><td>{}</td><td>{}</td></tr>'.format(team.wins, team.losses)
+            bracket_game_data += '</table>'
+
+        if self.knockout_tournament is not None:
+            bracket_game_data += '<b>Knockout</b><hr>'
+            bracket_game_data += '<a href="/tournaments/{}/">{}</a><br/>'.format(self.knockout_tournament.id, self.knockout_tournament.name)
+            if self.winning_team is not None:
+                bracket_game_data += self.winning_team_data
+
+        bracket_game_data += '</div></div>'  # row/container
+        self.bracket_game_data = bracket_game_data
 
 
     def get_start_locked_data(self):
@@ -1925,7 +2279,18 @@ class GroupStageTournament(Tournament):
 
             return draggable_data
 
+    def get_knockout_teams_per_group(self):
+        if self.knockout_teams > 0 and self.groups > 0:
+            return max(self.knockout_teams // self.groups, 1)
+        return 2
+
     def process_new_games(self):
+        if self.knockout_tournament is not None:
+            # the knockout is processed by the engine on its own, we're finished once it is
+            if self.knockout_tournament.is_finished:
+                self.finish_from_knockout()
+            return
+
         # we only process new games for the group stage if all round robin
         # tournaments have finished, at that point we then take the appropriate
         # players from each group and seed them accordingly and create
@@ -1934,24 +2299,90 @@ class GroupStageTournament(Tournament):
         print("Round robin tournaments finished: {}, groups: {}".format(round_robin_tournaments.count(), self.groups))
         if round_robin_tournaments.count() == self.groups:
             log_tournament("Finished with all round robin tournaments, proceeding to create the knockout tournament", self)
+            self.create_knockout_tournament()
+
+    def get_knockout_seeds(self):
+        # go ahead and loop through all the group teams once and determine the order
+        # in which each team finished
+        group_teams = defaultdict(list)
+        for team in TournamentTeam.objects.filter(tournament=self, group__isnull=False).order_by('-wins', '-buchholz'):
+            group_teams[team.group_id].append(team)
+
+        # tiers[0] holds every group winner, tiers[1] every runner up and so on, best records first
+        tiers = [[] for i in range(self.get_knockout_teams_per_group())]
+        for group in GroupStageTournamentGroup.objects.filter(tournament=self):
+            teams = sorted(group_teams[group.id], key=get_group_place_key)
+            for i in range(min(len(tiers), len(teams))):
+                tiers[i].append(teams[i])
+            if len(teams) > 0:
+                group.first_place = teams[0]
+            if len(teams) > 1:
+                group.second_place = teams[1]
+            group.save()
 
-            # seeded data fed into the tournament needs to be in the following format
-            # [seed1].[team];[seed2].[team];....
-            # teams do not need to have a seed
+        ordered_teams = []
+        for tier in tiers:
+            ordered_teams += sorted(tier, key=lambda team: (-team.wins, -team.buchholz))
+
+        # seed n plays seed (total + 1 - n) in the first round, so the top half keeps its order and
+        # the bottom half is arranged so nobody replays a team from their own group
+        half = len(ordered_teams) // 2
+        top_half = ordered_teams[:half]
+        bottom_half = get_knockout_opponents(top_half, ordered_teams[half:][::-1])
+        return top_half + bottom_half[::-1]
+
+    def create_knockout_tournament(self):
+        seeded_teams = self.get_knockout_seeds()
+
+        team_players = defaultdict(list)
+        for player in TournamentPlayer.objects.filter(team__in=seeded_teams):
+            team_players[player.team_id].append(player)
 
-            # go ahead and loop through all round_robin tournaments and determine the order
-            # in which each team finished
+        with transaction.atomic():
+            # lock the group stage so the knockout can only ever be created once
+            if not GroupStageTournament.objects.select_for_update().filter(pk=self.pk, knockout_tournament__isnull=True).exists():
+                return
 
-            # first_place always matches against a second_place in a group in the seeded, but order doesn't necessarily
-            # matter here
-            first_place_teams = []
-            second_place_teams = []
-            for tournament in round_robin_tournaments:
-                first_place_teams.append(tournament.first_place)
-                second_place_teams.append(tournament.second_place)
+            tournament_name = "{}: Knockout".format(self.name)
+            knockout = SeededTournament(name=tournament_name, max_players=len(seeded_teams)*self.players_per_team, multi_day=self.multi_day, start_option_when_full=False, private=True, description=self.description, template=self.template, template_settings=self.template_settings, teams_per_game=self.teams_per_game, created_by=self.created_by, players_per_team=self.players_per_team, host_sets_tourney=True, number_players=0)
+            knockout.save()
 
-            # now we loop through all the first/second place teams and assign them seeds
-            # a first seed always plays a second, and they cannot be from the same group
+            # the knockout gets its own teams so group stage records don't carry over
+            # seeded data fed into the tournament needs to be in the following format
+            # [seed1].[team];[seed2].[team];....
+            seed_data = []
+            knockout_players = []
+            for seed, team in enumerate(seeded_teams, 1):
+                knockout_team = TournamentTeam(tournament=knockout, players=team.players, team_index=seed, seed=seed)
+                knockout_team.save()
+                for player in team_players[team.id]:
+                    knockout_players.append(TournamentPlayer(tournament=knockout, team=knockout_team, player_id=player.player_id))
+                seed_data.append("{}.{}".format(seed, knockout_team.id))
+            TournamentPlayer.objects.bulk_create(knockout_players)
+
+            knockout.create_rounds(';'.join(seed_data))
+            knockout.save()
+
+            self.knockout_tournament = knockout
+            self.save()
+            log_tournament("Created knockout tournament {} with seeds {}".format(knockout.id, seed_data), self)
+
+        # the rounds are committed, now create all of the first round games in one pass
+        knockout.create_first_round_games()
+
+    def finish_from_knockout(self):
+        # the knockout has its own copies of the teams, map the winner back to ours by player
+        winning_team = self.knockout_tournament.winning_team
+        if winning_team is not None:
+            winning_player = TournamentPlayer.objects.filter(team=winning_team)
+            if winning_player:
+                group_player = TournamentPlayer.objects.filter(tournament=self, player_id=winning_player[0].player_id).select_related('team')
+                if group_player:
+                    self.champion1 = group_player[0].team
+                    self.winning_team = group_player[0].team
+        log_tournament("Knockout tournament finished, ending the group stage", self)
+        self.is_finished = True
+        self.save()
 
 
     def update_game_log(self):
@@ -2265,38 +2696,59 @@ class RoundRobinTournament(Tournament):
     def fill_teams(self):
         pass
 
+    def get_crosstable_data(self):
+        # teams across the top in their natural order and down the side by wins, each row holding the result of
+        # the side team against every top team. the entries, teams and players are each read once
+        teams = list(TournamentTeam.objects.filter(round_robin_tournament=self).order_by('id'))
+        team_players = defaultdict(list)
+        for tournament_player in TournamentPlayer.objects.filter(team__round_robin_tournament=self).select_related('player__clan'):
+            team_players[tournament_player.team_id].append(tournament_player)
+        labels = {}
+        for team in teams:
+            labels[team.id] = get_players_data(team_players[team.id], False)
+
+        results = {}
+        for entry in TournamentGameEntry.objects.filter(tournament=self).select_related('game').order_by('id'):
+            key = (entry.team_id, entry.team_opp_id)
+            if key in results:
+                continue
+            if entry.game.is_finished:
+                # results are from the point of view of the opponent, who is the team on the side
+                if entry.game.winning_team_id is not None and entry.game.winning_team_id == entry.team_opp_id:
+                    result = "win"
+                else:
+                    result = "loss"
+            else:
+                result = "in_progress"
+            results[key] = {'result': result, 'game_link': entry.game.game_link}
+
+        crosstable = {'teams': [], 'rows': []}
+        for team in teams:
+            crosstable['teams'].append({'id': team.id, 'label': labels[team.id]})
+        for team_left in sorted(teams, key=lambda team: -team.wins):
+            cells = [results.get((team_top.id, team_left.id)) for team_top in teams]
+            crosstable['rows'].append({'id': team_left.id, 'label': labels[team_left.id], 'cells': cells})
+        return crosstable
+
     def update_game_log(self):
         # table should be all teams on the top and all teams on the bottom
         # the games are from the teams on the left matched up with the teams on the right
-        teams = TournamentTeam.objects.filter(round_robin_tournament=self)
+        crosstable = self.get_crosstable_data()
+        colors = {'win': "#cde5b6;", 'loss': "#FBDFDF;", 'in_progress': "#ffe7a3;"}  # light green, light red, light yellow
         log = '<button class="btn btn-info" onclick="toggle_div(\'toggle-data-{}\');">Toggle {} Games</button>'.format(self.id, self.name)
         log += '<div id="toggle-data-{}" style="display:none;padding-top:25px;">'.format(self.id)
         log += '<table class="table table-bordered table-condensed clot_table"><tr><td>{}</td>'.format(self.name)
-        for team in teams:
-            log += '<td>{}</td>'.format(get_team_data(team))
+        for team in crosstable['teams']:
+            log += '<td>{}</td>'.format(team['label'])
         log += '</tr>'
-        teams2 = TournamentTeam.objects.filter(round_robin_tournament=self).order_by('-wins')
         teams_left_log = ""
-        for team_left in teams2:
-            teams_left_log += "TeamLeft: {}".format(get_team_data(team_left))
+        for row in crosstable['rows']:
+            teams_left_log += "TeamLeft: {}".format(row['label'])
             log += '<tr>'
-            log += '<td>{}</td>'.format(get_team_data(team_left))
-            for team_top in teams:
-                teams_left_log += "TeamTop: {}".format(get_team_data(team_top))
-                bg_color = ""
-                # now we create the rows, where each row loops through team and compares
-                # and looks up all games between then and team2
-                game = TournamentGameEntry.objects.filter(team=team_top, team_opp=team_left, tournament=self)
-                if game:
-                    game = game[0]
-                    if game.game.is_finished:
-                        if game.game.winning_team is not None and game.game.winning_team.id == team_left.id:
-                            bg_color = "#cde5b6;"  # light green - win
-                        else:
-                            bg_color = "#FBDFDF;"  # light red - lose
-                    else:
-                        bg_color = "#ffe7a3;"  # light yellow - in progress
-                    log += '<td style="background-color:{}"><a href="{}" target="_blank">Game Link</a></td>'.format(bg_color, game.game.game_link)
+            log += '<td>{}</td>'.format(row['label'])
+            for cell in row['cells']:
+                if cell is not None:
+                    log += '<td style="background-color:{}"><a href="{}" target="_blank">Game Link</a></td>'.format(colors[cell['result']], cell['game_link'])
                 else:
                     # empty cell
                     log += '<td></td>'
@@ -2317,6 +2769,18 @@ class TournamentRound(models.Model):
     is_finished = models.BooleanField(default=False)
     number_games = models.IntegerField(default=0)
 
+    def __init__(self, *args, **kwargs):
+        super(TournamentRound, self).__init__(*args, **kwargs)
+        self.loaded_is_finished = self.__dict__.get('is_finished')
+
+    def save(self, *args, **kwargs):
+        round_advanced = self.is_finished and not self.loaded_is_finished
+        super(TournamentRound, self).save(*args, **kwargs)
+        self.loaded_is_finished = self.is_finished
+        if round_advanced:
+            bump_changed_tournament_versions()
+            emit_event([self.tournament_id], "round_advanced", {'round': self.round_number})
+
     def get_round_number(self):
         print("Getting round #: tournament name {}, round #: {}".format(self.tournament.name, self.round_number))
         return self.round_number
@@ -2346,6 +2810,21 @@ class TournamentTeam(models.Model):
     has_had_bye = models.BooleanField(default=False)
     joined_time = models.DateTimeField(default=datetime.datetime.now)
 
+    def save(self, *args, **kwargs):
+        super(TournamentTeam, self).save(*args, **kwargs)
+        self.mark_tournaments_changed()
+
+    def delete(self, *args, **kwargs):
+        self.mark_tournaments_changed()
+        return super(TournamentTeam, self).delete(*args, **kwargs)
+
+    def mark_tournaments_changed(self):
+        mark_tournament_changed(self.tournament_id)
+        mark_tournament_changed(self.round_robin_tournament_id)
+
+    def get_fragment_key(self, fragment, tournament_players=()):
+        return "{}:team:{}:{}:{}:{}:{}".format(fragment, self.id, self.wins, self.losses, self.rating, get_players_fragment_key(tournament_players))
+
     def update_max_games_at_once(self, games):
         print("Updating max games to {}".format(games))
         if games.isnumeric() and int(games) <= self.tournament.get_max_games_at_once() and int(games) >= 2:
@@ -2415,6 +2894,13 @@ class TournamentGame(models.Model):
     def __str__(self):
         return "Round {} game in {} between {}. Game ID ({}) Finished? {}".format(self.round.round_number, self.tournament.name, self.teams, self.gameid, self.is_finished)
 
+    def get_fragment_key(self, fragment, tournament_players=()):
+        # the key changes with everything a rendered game shows, so a stale fragment is never read
+        boot_time = 0
+        if self.game_boot_time is not None:
+            boot_time = int(self.game_boot_time.timestamp())
+        return "{}:game:{}:{}:{}:{}:{}:{}".format(fragment, self.id, self.is_finished, self.winning_team_id, self.current_state, boot_time, get_players_fragment_key(tournament_players)).replace(' ', '')
+
     def finish_game_with_info(self, game_info):
         self.finish_game()
 
@@ -2447,6 +2933,7 @@ class TournamentGame(models.Model):
 
             self.game_finished_time = timezone.now()
             self.save()
+            invalidate_player_game_summaries([tournament_team1[0].id, tournament_team2[0].id], self.tournament_id)
 
     def create_entry(self, team1, team2):
         team1Entry = TournamentGameEntry(team=team1, team_opp=team2, game=self,
@@ -2456,6 +2943,7 @@ class TournamentGame(models.Model):
         team2Entry = TournamentGameEntry(team=team2, team_opp=team1, game=self,
                                          tournament=self.tournament, round=self.round)
         team2Entry.save()
+        invalidate_player_game_summaries([team1.id, team2.id], self.tournament_id)
 
     def save_with_entry(self):
         log_tournament("Save Internal for: {}".format(self.teams), self.tournament)
@@ -2492,6 +2980,14 @@ class TournamentPlayer(models.Model):
     def get_max_games_at_once_option(self):
         return self.team.get_max_games_at_once_option()
 
+    def save(self, *args, **kwargs):
+        super(TournamentPlayer, self).save(*args, **kwargs)
+        mark_tournament_changed(self.tournament_id)
+
+    def delete(self, *args, **kwargs):
+        mark_tournament_changed(self.tournament_id)
+        return super(TournamentPlayer, self).delete(*args, **kwargs)
+
 class TournamentInvite(models.Model):
     tournament = models.ForeignKey('Tournament', on_delete=models.CASCADE)
     player = models.ForeignKey('Player', on_delete=models.DO_NOTHING)
@@ -2500,6 +2996,14 @@ class TournamentInvite(models.Model):
     def __str__(self):
         return "Tournament {}, player {}, joined? {}".format(self.tournament.name, self.player.name, self.joined)
 
+    def save(self, *args, **kwargs):
+        super(TournamentInvite, self).save(*args, **kwargs)
+        mark_tournament_changed(self.tournament_id)
+
+    def delete(self, *args, **kwargs):
+        mark_tournament_changed(self.tournament_id)
+        return super(TournamentInvite, self).delete(*args, **kwargs)
+
 
 class MonthlyTemplateRotationMonth(TournamentRound):
     template = models.IntegerField(default=0)
@@ -2545,9 +3049,54 @@ class MonthlyTemplateRotation(Tournament):
                   "November",
                   "December"]
 
+    leaderboard = models.TextField(blank=True, null=True, default="")
+
+    # number of games a team must finish in the last 90 days to be ranked
+    ranked_games_required = 12
+
+    # rows per page of the game log
+    game_log_page_size = 50
+
+    version_fields = Tournament.version_fields + ['leaderboard', 'current_template']
+
     def __str__(self):
         return "MTC: {}, id: {}, first template: {}".format(self.name, self.id, self.template)
 
+    def cache_data(self):
+        super(MonthlyTemplateRotation, self).cache_data()
+        self.update_leaderboard()
+
+    def get_leaderboard_data(self):
+        # one aggregate query for every active team's player, rating and the number of games they finished
+        # in the last 90 days
+        nowdate = datetime.datetime.now(tz=pytz.UTC)
+        enddate = nowdate - datetime.timedelta(days=90)
+        teams = TournamentTeam.objects.filter(tournament=self, active=True).values('id', 'rating', 'tournamentplayer__player__token', 'tournamentplayer__player__name', 'tournamentplayer__player__clan__name', 'tournamentplayer__player__clan__icon_link', 'tournamentplayer__player__clan__image_path')
+        teams = teams.annotate(games_finished=Count('team', filter=Q(team__is_finished=True, team__created_date__gt=enddate), distinct=True)).order_by('-rating', '-wins', 'id')
+
+        leaderboard = []
+        for team in teams:
+            if team['tournamentplayer__player__token'] is None:
+                continue
+            clan = None
+            if team['tournamentplayer__player__clan__name'] is not None:
+                clan = {'name': team['tournamentplayer__player__clan__name'], 'icon_link': team['tournamentplayer__player__clan__icon_link'], 'image_path': team['tournamentplayer__player__clan__image_path']}
+            leaderboard.append({'team': team['id'], 'rating': team['rating'], 'games_finished': team['games_finished'], 'token': team['tournamentplayer__player__token'], 'name': team['tournamentplayer__player__name'], 'clan': clan})
+        return leaderboard
+
+    def update_leaderboard(self):
+        # the engine refreshes the snapshot every pass, the site and the bot only ever read it
+        leaderboard = self.get_leaderboard_data()
+        self.number_players = len(leaderboard)
+        self.leaderboard = json.dumps(leaderboard)
+        self.save()
+
+    def get_leaderboard(self):
+        if self.leaderboard == "" or self.leaderboard is None:
+            # not refreshed by the engine yet, build it without saving
+            return self.get_leaderboard_data()
+        return json.loads(self.leaderboard)
+
     def get_game_name(self):
         current_month = self.get_current_month()
         return "MTC | {}, {} - {}".format(self.month_str[current_month.month], current_month.year, self.name)
@@ -2804,57 +3353,38 @@ class MonthlyTemplateRotation(Tournament):
         # joined
         table = ''
 
-        # a few overrides on the pass in values
-        in_tournament = False
-        tournament_player = TournamentPlayer.objects.filter(player=request_player, tournament=self.id)
-        if tournament_player:
-            in_tournament = True
-
-        tournamentteams = TournamentTeam.objects.filter(tournament=self.id, active=True).order_by('-rating', '-wins')
-        if tournamentteams:
+        leaderboard = self.get_leaderboard()
+        if leaderboard:
             table += '<table class="table table-hover">'
             table += '<tr><th>Rank</th><th>Player</th><th>Rating</th></tr>'
             team_index = 1
-            ordered_team_data = []
 
-            # for good measure
-            self.number_players = tournamentteams.count()
-            self.save()
             unranked_data = []
             ranked_data = []
-            for team in tournamentteams:
-                if self.players_per_team > 1:
-                    table += "<tr><td><b>Team {} </b></td></tr>".format(team.team_index)
-
-                team_players = TournamentPlayer.objects.filter(team=team)
-                if team_players:
-
-                    for player in team_players:
-                        pass  # do we want multiple teams in MTC? who knows...
-
-                    ranked = False
-                    team_data_internal = ""
-                    rating = team.rating
-                    # lookup how many games this team has completed in the last 3 months
-                    # if 10 or more, then display their rating
-                    games_completed_3_months = get_games_finished_for_team_since(team.id, self,
-                                                                                 90)  # all games completed within last 90 days
-                    if games_completed_3_months >= 12:
-                        team_data_internal = '<tr><td>#{}</td><td>'.format(team_index)
-                        team_index += 1
-                        ranked = True
-                    else:
-                        team_data_internal = '<tr><td>Unranked</td><td>'
-
-                    team_data_internal += get_player_data(team_players[0])
-                    team_data_internal += '</td>'
-                    team_data_internal += '<td>{}</td>'.format(rating)
-                    team_data_internal += '</tr>'
-
-                    if ranked:
-                        ranked_data.append(team_data_internal)
-                    else:
-                        unranked_data.append(team_data_internal)
+            for team in leaderboard:
+                ranked = False
+                team_data_internal = ""
+                # only teams that have completed enough games in the last 3 months get a rank
+                if team['games_finished'] >= self.ranked_games_required:
+                    team_data_internal = '<tr><td>#{}</td><td>'.format(team_index)
+                    team_index += 1
+                    ranked = True
+                else:
+                    team_data_internal = '<tr><td>Unranked</td><td>'
+
+                if team['clan'] is not None:
+                    team_data_internal += '<a href="https://warzone.com{}" target="_blank"><img src="{}" alt="{}" /></a>'.format(
+                        team['clan']['icon_link'], team['clan']['image_path'], team['clan']['name'])
+                team_data_internal += '&nbsp;<a href="https://warzone.com/Profile?p={}" target="_blank">{}</a>&nbsp;'.format(
+                    team['token'], team['name'])
+                team_data_internal += '</td>'
+                team_data_internal += '<td>{}</td>'.format(team['rating'])
+                team_data_internal += '</tr>'
+
+                if ranked:
+                    ranked_data.append(team_data_internal)
+                else:
+                    unranked_data.append(team_data_internal)
 
             # combine the ranked + unranked lists
             ordered_data = ranked_data + unranked_data
@@ -2976,35 +3506,75 @@ class MonthlyTemplateRotation(Tournament):
             self.fill_teams()
 
     def update_game_log(self):
+        # only the table is cached here, the rows are fetched a page at a time from the game log endpoint
         game_log = '<div class="row"><div class="container">'
-        game_log += '<table class="table table-hover table_condensed clot_table compact stripe cell-border" id="game_log_data_table"><thead><tr>'
-        game_log += '<th>Link</th><th>Matchup</th><th>Winner</th></tr></thead><tbody>'
+        game_log += '<table class="table table-hover table_condensed clot_table compact stripe cell-border" id="game_log_data_table" data-url="/tournaments/game_log/" data-tournament="{}" data-page-length="{}"><thead><tr>'.format(self.id, self.game_log_page_size)
+        game_log += '<th>Link</th><th>Matchup</th><th>Winner</th></tr></thead><tbody></tbody></table></div></div>'
+        self.game_log = game_log
+        self.save()
 
-        games_output = []
-        tournament_game_entries = TournamentGameEntry.objects.filter(is_finished=True, tournament=self).order_by('-created_date')
-        for entry in tournament_game_entries:
-            if entry.game.id in games_output:
-                continue
+    def get_game_log_count_key(self):
+        return "mtc_log_count:{}".format(self.id)
 
-            game_log += '<tr>'
+    def game_finished(self, game, winning_team, losing_team):
+        cache.delete(self.get_game_log_count_key())
 
-            # link to the game
-            game_log += '<td><a href="{}" target="_blank">Game Link</a></td>'.format(entry.game.game_link)
-            game_log += '<td>{} vs. {}</td>'.format(get_team_data_sameline(entry.team), get_team_data_sameline(entry.team_opp))
+    def get_game_log_page(self, data):
+        # data is the DataTables request, rows are ordered by game id and pages after the first continue from
+        # the last game id the client saw instead of counting past every earlier game
+        games = TournamentGame.objects.filter(tournament=self, is_finished=True)
+        records_total = cache.get(self.get_game_log_count_key())
+        if records_total is None:
+            records_total = games.count()
+            cache.set(self.get_game_log_count_key(), records_total, 180)
+        records_filtered = records_total
+
+        search = data.get('search', '').strip()
+        if len(search) > 0:
+            teams = TournamentPlayer.objects.filter(tournament=self, player__name__icontains=search).values('team_id')
+            games = games.filter(id__in=TournamentGameEntry.objects.filter(tournament=self, team__in=teams).values('game_id'))
+            records_filtered = games.count()
+
+        length = min(max(int(data.get('length', self.game_log_page_size)), 1), 100)
+        after = data.get('after', '')
+        if data.get('order', 'desc') == 'asc':
+            games = games.order_by('id')
+            if after.isnumeric():
+                games = games.filter(id__gt=int(after))
+        else:
+            games = games.order_by('-id')
+            if after.isnumeric():
+                games = games.filter(id__lt=int(after))
 
-            winner = ""
-            if entry.game.winning_team is not None:
-                if entry.team.id == entry.game.winning_team.id:
-                    winner = get_team_data(entry.team)
-                else:
-                    winner = get_team_data(entry.team_opp)
-            game_log += '<td>{}</td>'.format(winner)
-            game_log += '</tr>'
+        if after.isnumeric():
+            games = list(games[:length])
+        else:
+            start = max(int(data.get('start', 0)), 0)
+            games = list(games[start:start + length])
 
-            games_output.append(entry.game.id)
-        game_log += '</tbody></table></div></div>'
-        self.game_log = game_log
-        self.save()
+        team_ids = []
+        for game in games:
+            team_ids += [int(team) for team in game.teams.split('.')]
+        team_players = defaultdict(list)
+        for tournament_player in TournamentPlayer.objects.filter(team_id__in=team_ids).select_related('player__clan'):
+            team_players[tournament_player.team_id].append(tournament_player)
+
+        rows = []
+        for game in games:
+            rows.append(self.get_game_log_row(game, team_players))
+
+        last_id = None
+        if len(games) > 0:
+            last_id = games[-1].id
+        return {'draw': int(data.get('draw', 0)), 'recordsTotal': records_total, 'recordsFiltered': records_filtered, 'data': rows, 'last_id': last_id}
+
+    def get_game_log_row(self, game, team_players):
+        teams = game.teams.split('.')
+        winner = ""
+        if game.winning_team_id is not None:
+            winner = get_players_data(team_players[game.winning_team_id], False)
+        matchup = '{} vs. {}'.format(get_players_data(team_players[int(teams[0])], True), get_players_data(team_players[int(teams[1])], True))
+        return ['<a href="{}" target="_blank">Game Link</a>'.format(game.game_link), matchup, winner]
 
     def get_bracket_game_data(self):
         return self.bracket_game_data
@@ -3015,25 +3585,29 @@ class MonthlyTemplateRotation(Tournament):
         bracket_data += '<table class="table table-hover"><tr>'
         bracket_data += '<th>Team</th><th>Overall Record</th></tr>'
         # we want to only display the overall wins/losses, with the current month wins/losses next to it
-        tournament_teams = TournamentTeam.objects.filter(tournament=self).order_by('-wins', '-rating')
-        for team in tournament_teams:
-            bracket_data += '<tr>'
-            bracket_data += '<td>'
-
-            tournament_player = TournamentPlayer.objects.filter(team=team)
-            if tournament_player:
-                bracket_data += get_player_data(tournament_player[0])
-
-            bracket_data += '</td>'
-            bracket_data += '<td>'
-            bracket_data += '{}-{}'.format(team.wins, team.losses)
-            bracket_data += '</td></tr>'
+        tournament_teams = list(TournamentTeam.objects.filter(tournament=self).order_by('-wins', '-rating'))
+        team_players = get_team_players(self)
+        bracket_data += get_cached_fragments(tournament_teams, lambda team: team.get_fragment_key('mtc_team', team_players[team.id][:1]), lambda team: self.get_team_row(team, team_players))
 
         bracket_data += '</table>'
         bracket_data += "</div></div>"
         self.bracket_game_data = bracket_data
         self.save()
 
+    def get_team_row(self, team, team_players):
+        row = '<tr>'
+        row += '<td>'
+
+        tournament_player = team_players[team.id]
+        if tournament_player:
+            row += get_player_data(tournament_player[0])
+
+        row += '</td>'
+        row += '<td>'
+        row += '{}-{}'.format(team.wins, team.losses)
+        row += '</td></tr>'
+        return row
+
     def get_start_delete_buttons(self):
         return ""
 
@@ -3121,27 +3695,19 @@ class PromotionalRelegationLeague(Tournament):
         # joined
         table = ''
 
-        # a few overrides on the pass in values
-        in_tournament = False
-        tournament_player = TournamentPlayer.objects.filter(player=request_player, tournament=self.id)
-        if tournament_player:
-            in_tournament = True
-
-        tournamentteams = TournamentTeam.objects.filter(tournament=self.id).order_by('-rating', '-wins')
+        tournamentteams = list(TournamentTeam.objects.filter(tournament=self.id).order_by('-rating', '-wins'))
         if tournamentteams:
             table += '<table class="table table-hover">'
             table += '<tr><th>Player</th><th>Active?</th></tr>'
-            team_index = 1
-            ordered_team_data = []
 
             # for good measure
-            self.number_players = tournamentteams.count()
+            self.number_players = len(tournamentteams)
             self.save()
-            unranked_data = []
-            ranked_data = []
+
+            players_by_team = get_team_players(self)
             for team in tournamentteams:
                 table += "<tr>"
-                table += "<td>{}</td>".format(get_team_data(team))
+                table += "<td>{}</td>".format(get_players_data(players_by_team[team.id], False))
                 if team.active:
                     table += "<td>Yes</td>"
                 else:
@@ -3261,10 +3827,24 @@ class ClanLeagueDivisionClan(models.Model):
     max_points_possible = models.IntegerField(default=0, blank=True, null=True)
     total_points = models.IntegerField(default=0, blank=True, null=True)
 
+    def __str__(self):
+        return "{} in {}: {} points, {} possible".format(self.clan.name, self.division.title, self.total_points, self.max_points_possible)
+
 class ClanLeagueDivision(models.Model):
     title = models.CharField(default="", blank=True, null=True, max_length=255)
     league = models.ForeignKey('ClanLeague', on_delete=models.CASCADE, null=True, blank=True)
 
+    def get_standings_table(self):
+        table = '<table class="table table-hover table-condensed">'
+        table += '<tr><th>Place</th><th>Clan</th><th>Points</th><th>Max Possible</th></tr>'
+        clans = ClanLeagueDivisionClan.objects.filter(division=self).select_related('clan').order_by('-total_points', '-max_points_possible')
+        place = 1
+        for clan in clans:
+            table += '<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>'.format(place, get_clan_data(clan.clan), clan.total_points, clan.max_points_possible)
+            place += 1
+        table += '</table>'
+        return table
+
     def get_division_card(self, type, editable):
         division_data = '<br/><div class ="card gedf-card span6">'
         division_data += '<div class ="card-header">'
@@ -3296,12 +3876,15 @@ class ClanLeagueDivision(models.Model):
             # now we need to put all clans in the division at the bottom regardless of what card we're showing
             if clans.count() > 0:
                 if self.league.has_started:
-                    division_data += '<b>Clans</b><hr>'
-                for clan in clans:
-                    division_data += '{}'.format(get_clan_data(clan.clan))
-                    if not self.league.has_started and editable:
-                        division_data += '&nbsp;<a href="javascript:void(0);" class="badge badge-danger" id="remove-clan" data-clan="{}" data-division="{}">Remove</a>'.format(clan.clan.id, self.id)
-                    division_data += '&nbsp;&nbsp;&nbsp;'
+                    # standings are kept up to date as games finish, so just read them in order
+                    division_data += '<b>Standings</b><hr>'
+                    division_data += self.get_standings_table()
+                else:
+                    for clan in clans:
+                        division_data += '{}'.format(get_clan_data(clan.clan))
+                        if editable:
+                            division_data += '&nbsp;<a href="javascript:void(0);" class="badge badge-danger" id="remove-clan" data-clan="{}" data-division="{}">Remove</a>'.format(clan.clan.id, self.id)
+                        division_data += '&nbsp;&nbsp;&nbsp;'
 
                 if self.league.has_started:
                     division_data += '<br/><br/><b>Tournaments</b><hr>'
@@ -3382,6 +3965,23 @@ class ClanLeagueTournament(RoundRobinTournament):
     def update_bracket_game_data(self):
         self.bracket_game_data = ""
 
+    def get_points_for_win(self):
+        # every player on the winning team earns their clan a point, so team templates are worth more
+        return self.players_per_team
+
+    def cache_data(self):
+        super(ClanLeagueTournament, self).cache_data()
+        if self.division is not None:
+            self.division.league.update_game_log_rows(self)
+
+    def game_finished(self, game, winning_team, losing_team):
+        # update the clan standings in place, the winner gains the points and the loser
+        # can no longer earn them. F() keeps the counters correct without recounting any games
+        points = self.get_points_for_win()
+        ClanLeagueDivisionClan.objects.filter(pk=winning_team.clan_league_clan_id).update(total_points=F('total_points') + points)
+        ClanLeagueDivisionClan.objects.filter(pk=losing_team.clan_league_clan_id).update(max_points_possible=F('max_points_possible') - points)
+        log_tournament("Clan standings updated: team {} won {} points against team {}".format(winning_team.id, points, losing_team.id), self)
+
     def process_new_games(self):
         # just call into the parent to create games
         if self.should_create_game():  # remove the date as well, so if we fail in create game we are screwed and manually need to re-add the date
@@ -3479,6 +4079,8 @@ class ClanLeague(Tournament):
     start_day = models.IntegerField(default=0, null=True, blank=True)
     start_month = models.IntegerField(default=0, null=True, blank=True)
     start_year = models.IntegerField(default=0, null=True, blank=True)
+    # set once the clan counters have been recounted, after that game_finished keeps them current
+    standings_seeded = models.BooleanField(default=False)
 
     def fill_teams(self):
         pass
@@ -3760,24 +4362,48 @@ class ClanLeague(Tournament):
         self.game_creation_allowed = False
         self.save()
 
-    def process_new_games(self):
-        # we should process the results here
-        divisions = ClanLeagueDivision.objects.filter(league=self)
-        for division in divisions:
-            dclans = ClanLeagueDivisionClan.objects.filter(division=division)
-            for dclan in dclans:
-                # for each clan in the division, calculate max possible and current point totals
-                pass
-
-    def get_players_select(self):
-        data = '<select id="clanleague-add-playerlist">'
-
-        players = Player.objects.all()
-        for player in players:
-            data += '<option value="{}">{}</option>'.format(player.id, player.name)
+        # seed the max points possible for every clan
+        self.rebuild_standings()
 
-        data += '</select>'
-        # this returns the form that lets the creator add any player to any
+    def process_new_games(self):
+        # standings are updated by ClanLeagueTournament.game_finished as each game finishes
+        # leagues started before that only need their counters seeded once
+        if not self.standings_seeded:
+            self.rebuild_standings()
+
+    def rebuild_standings(self):
+        # full recount of every clan's points from aggregate queries, used to audit (or repair)
+        # the counters that are otherwise maintained incrementally
+        tournaments = ClanLeagueTournament.objects.filter(parent_tournament=self)
+        finished_games = TournamentGame.objects.filter(tournament__in=tournaments, is_finished=True, winning_team__isnull=False)
+
+        points_won = {}
+        for row in finished_games.values('winning_team__clan_league_clan').annotate(points=Sum('tournament__players_per_team')):
+            points_won[row['winning_team__clan_league_clan']] = row['points']
+
+        points_lost = {}
+        lost_entries = TournamentGameEntry.objects.filter(game__in=finished_games).exclude(game__winning_team=F('team'))
+        for row in lost_entries.values('team__clan_league_clan').annotate(points=Sum('tournament__players_per_team')):
+            points_lost[row['team__clan_league_clan']] = row['points']
+
+        # each clan plays every other clan in its division once per template
+        template_points = {}
+        for row in tournaments.values('division').annotate(points=Sum('players_per_team')):
+            template_points[row['division']] = row['points']
+
+        clans_in_division = {}
+        for row in ClanLeagueDivisionClan.objects.filter(division__league=self).values('division').annotate(clans=Count('id')):
+            clans_in_division[row['division']] = row['clans']
+
+        with transaction.atomic():
+            for dclan in ClanLeagueDivisionClan.objects.filter(division__league=self).select_for_update():
+                points_available = (clans_in_division[dclan.division_id] - 1) * template_points.get(dclan.division_id, 0)
+                dclan.total_points = points_won.get(dclan.id, 0)
+                dclan.max_points_possible = points_available - points_lost.get(dclan.id, 0)
+                dclan.save()
+            ClanLeague.objects.filter(pk=self.pk).update(standings_seeded=True)
+        self.standings_seeded = True
+        log_tournament("Rebuilt clan league standings", self)
 
     def get_roster_data(self):
         return self.get_roster_data_impl(0, False)
@@ -3816,93 +4442,130 @@ class ClanLeague(Tournament):
         self.save()
 
     def update_game_log(self):
+        # the log is kept up to date a row at a time by the tournaments as their games change
         if self.number_players == 0:
             players = TournamentPlayer.objects.filter(tournament=self)
             self.number_players = players.count()
             self.save()
-        log = '<table class="table table-bordered table-condensed clot_table compact stripe cell-border" id="game_log_data_table"><thead><tr><th>Tournament</th><th>Division</th><th>Match-Up</th><th>Game Link</th><th>State</th><th>Winning Team</th><th>Time To Boot</th></tr></thead>'
-        log += '<tbody>'
-        tournaments = ClanLeagueTournament.objects.filter(parent_tournament=self)
-        for t in tournaments:
-            games = TournamentGame.objects.filter(tournament=t)
-            for game in games:
-                log += '<tr>'
-                log += '<td>{}</td>'.format(t.clan_league_template.name)
-                log += '<td>{}</td>'.format(t.division.title)
-
-                # create the match-up text for the game
-                game_data = game.teams.split('.')
-                team1 = game_data[0]
-                team2 = game_data[1]
-                team_1 = TournamentTeam.objects.filter(id=int(team1))
-                if team_1:
-                    team_2 = TournamentTeam.objects.filter(id=int(team2))
-                    if team_2:
-                        log += '<td data-search="{} {} {} {}">{}</td>'.format(team_1[0].clan_league_clan.clan.name, team_2[0].clan_league_clan.clan.name, get_team_data_no_clan(team_1[0]), get_team_data_no_clan(team_2[0]), get_matchup_data(team_1[0], team_2[0]))
-                log += '<td><a href="{}" target="_blank">Game Link</a></td>'.format(game.game_link)
-
-                if game.is_finished:
-                    finished_text = '<span class="text-success"><b>Finished</b></span>'
-                else:
-                    finished_text = '<span class="text-info">{}</span>'.format(game.current_state)
-                log += '<td>{}</td>'.format(finished_text)
 
-                if game.is_finished:
-                    winning_team = '{}'.format(get_team_data(game.winning_team))
-                else:
-                    winning_team = ''
-                log += '<td>{}</td>'.format(winning_team)
-                time_to_boot_calculate = 0
-                if game.game_boot_time != "" and game.game_boot_time is not None:
-                    if game.is_finished:
-                        time_to_boot = game.game_finished_time
-                    elif game.game_boot_time.replace(tzinfo=None) < datetime.datetime.now().replace(tzinfo=None) and game.current_state == "WaitingForPlayers":
-                        time_to_boot = game.game_boot_time.strftime("%b %d, %Y %H:%M:%S %p")
-                        time_to_boot_calculate = 1
-                    else:
-                        time_to_boot = "N/A"
-                else:
-                    time_to_boot = "N/A"
-                log += '<td class="time_to_boot" data-calculate="{}">{}</td>'.format(time_to_boot_calculate, time_to_boot)
-                log += '</tr>'
+        # pick up any game no tournament has written a row for yet, e.g. from tournaments that finished before
+        # the log was kept this way
+        tournaments = self.get_clan_league_tournaments()
+        self.write_game_log_rows(tournaments, TournamentGame.objects.filter(tournament__in=list(tournaments), clan_league_log_row__isnull=True))
 
+    def get_game_log(self):
+        log = '<table class="table table-bordered table-condensed clot_table compact stripe cell-border" id="game_log_data_table"><thead><tr><th>Tournament</th><th>Division</th><th>Match-Up</th><th>Game Link</th><th>State</th><th>Winning Team</th><th>Time To Boot</th></tr></thead>'
+        log += '<tbody>'
+        log += ''.join(ClanLeagueGameLogRow.objects.filter(league=self).order_by('game__tournament_id', 'game_id').values_list('row', flat=True))
         log += '</tbody></table>'
-        self.game_log = log
-        self.save()
+        return log
+
+    def get_clan_league_tournaments(self):
+        tournaments = {}
+        for t in ClanLeagueTournament.objects.filter(parent_tournament=self).select_related('clan_league_template', 'division'):
+            tournaments[t.id] = t
+        return tournaments
+
+    def update_game_log_rows(self, tournament):
+        # only games that are new or were still going the last time we wrote them can have changed
+        games = TournamentGame.objects.filter(tournament=tournament).filter(Q(clan_league_log_row__isnull=True) | Q(clan_league_log_row__is_finished=False))
+        self.write_game_log_rows({tournament.id: tournament}, games)
+
+    def write_game_log_rows(self, tournaments, games):
+        # render and save only the rows whose version moved since they were written
+        for game in games.select_related('clan_league_log_row'):
+            version = self.get_game_log_row_key(game)
+            if hasattr(game, 'clan_league_log_row'):
+                log_row = game.clan_league_log_row
+                if log_row.version == version:
+                    continue
+            else:
+                log_row = ClanLeagueGameLogRow(league=self, game=game)
+            log_row.version = version
+            log_row.is_finished = game.is_finished
+            log_row.row = self.get_game_log_row(tournaments[game.tournament_id], game)
+            log_row.save()
+            mark_tournament_changed(self.id)
+
+    def rebuild_game_log(self):
+        # renders every row in the league again, only needed if rows were lost or the row format changed
+        tournaments = self.get_clan_league_tournaments()
+        log_rows = []
+        for game in TournamentGame.objects.filter(tournament__in=list(tournaments)):
+            log_rows.append(ClanLeagueGameLogRow(league=self, game=game, version=self.get_game_log_row_key(game), is_finished=game.is_finished, row=self.get_game_log_row(tournaments[game.tournament_id], game)))
+        with transaction.atomic():
+            ClanLeagueGameLogRow.objects.filter(league=self).delete()
+            ClanLeagueGameLogRow.objects.bulk_create(log_rows)
+        bump_tournament_version(self.id)
+
+    def is_game_past_boot_time(self, game):
+        return game.game_boot_time.replace(tzinfo=None) < datetime.datetime.now().replace(tzinfo=None) and game.current_state == "WaitingForPlayers"
+
+    def get_game_log_row_key(self, game):
+        # the boot countdown shows up once the boot time passes, so that is part of the row's version too
+        past_boot_time = not game.is_finished and game.game_boot_time is not None and self.is_game_past_boot_time(game)
+        return "{}:{}".format(game.get_fragment_key('cl_log'), past_boot_time)
+
+    def get_game_log_row(self, tournament, game):
+        row = '<tr>'
+        row += '<td>{}</td>'.format(tournament.clan_league_template.name)
+        row += '<td>{}</td>'.format(tournament.division.title)
+
+        # create the match-up text for the game
+        game_data = game.teams.split('.')
+        team1 = game_data[0]
+        team2 = game_data[1]
+        team_1 = TournamentTeam.objects.filter(id=int(team1))
+        if team_1:
+            team_2 = TournamentTeam.objects.filter(id=int(team2))
+            if team_2:
+                row += '<td data-search="{} {} {} {}">{}</td>'.format(team_1[0].clan_league_clan.clan.name, team_2[0].clan_league_clan.clan.name, get_team_data_no_clan(team_1[0]), get_team_data_no_clan(team_2[0]), get_matchup_data(team_1[0], team_2[0]))
+        row += '<td><a href="{}" target="_blank">Game Link</a></td>'.format(game.game_link)
+
+        if game.is_finished:
+            finished_text = '<span class="text-success"><b>Finished</b></span>'
+        else:
+            finished_text = '<span class="text-info">{}</span>'.format(game.current_state)
+        row += '<td>{}</td>'.format(finished_text)
+
+        if game.is_finished:
+            winning_team = '{}'.format(get_team_data(game.winning_team))
+        else:
+            winning_team = ''
+        row += '<td>{}</td>'.format(winning_team)
+        time_to_boot_calculate = 0
+        if game.game_boot_time != "" and game.game_boot_time is not None:
+            if game.is_finished:
+                time_to_boot = game.game_finished_time
+            elif self.is_game_past_boot_time(game):
+                time_to_boot = game.game_boot_time.strftime("%b %d, %Y %H:%M:%S %p")
+                time_to_boot_calculate = 1
+            else:
+                time_to_boot = "N/A"
+        else:
+            time_to_boot = "N/A"
+        row += '<td class="time_to_boot" data-calculate="{}">{}</td>'.format(time_to_boot_calculate, time_to_boot)
+        row += '</tr>'
+        return row
 
     def get_join_leave(self, allow_buttons, logged_in, request_player):
         return ""
 
+    def get_invite_candidates_queryset(self, creator_token, viewer_token):
+        # any player can be swapped onto a clan league team
+        return Player.objects.all()
+
+    def get_invite_button(self, player, request_data):
+        return '<td><button class="btn btn-info btn-sm" id="cl-update-player-{}" name="slot" data-swapid="{}" data-player="{}">Swap</button></td>'.format(
+            player.id, player.id, escape(request_data['data_attrib[player]']))
+
     def get_invited_players_inverse_table(self, creator_token, request_data, viewer_token):
-        # get all the players, and only add the players we care about (excluding invited players) to the html
-        table = '<div class="row"><input type="text" id="invite-filter" placeholder="Filter Players" /><input type="hidden" id="cl-player-id" value="{}" /></div>'
+        # only the first page of players is sent down, the rest are searched for by name
+        table = '<div class="row"><input type="text" id="invite-filter" placeholder="Search Players" value="{}" /><input type="hidden" id="cl-player-id" value="{}" /></div>'.format(
+            escape(request_data.get('q', '')), escape(request_data['data_attrib[player]']))
         table += '<table class="table table-hover">'
         table += '<thead><tr><th>Player Name</th><th> </th></tr></thead><tbody id="invite-filter-table">'
-
-        print("Request data to generate CL player list: {}".format(request_data))
-        is_player_available = False
-        players = Player.objects.all()
-        # list of player names associated with the rows so that we can do easy filtering on the client
-        # side
-        for player in players:
-            is_player_available = True
-            # player wasn't invited to this tournament
-            # check if it's us, if it is, skip
-            table += '<tr><td>'
-            if player.clan is not None:
-                table += '<a href="https://warzone.com{}" target="_blank"><img src="{}" alt="{}" /></a>'.format(
-                    player.clan.icon_link, player.clan.image_path, player.clan.name)
-
-            table += '<a href="https://warzone.com/Profile?p={}" target="_blank"><span class="invite_name">{}</span></a>'.format(
-                player.token, player.name)
-            table += '</td>'
-            table += '<td><button class="btn btn-info btn-sm" id="cl-update-player-{}" name="slot" data-swapid="{}" data-player="{}">Swap</button></td>'.format(
-                player.id, player.id, request_data['data_attrib[player]'])
-            table += '</tr>'
-
-        if not is_player_available:
-            table += 'There are no players to invite.'
-
+        table += self.get_invite_candidates_rows(creator_token, request_data, viewer_token)
         table += '</tbody></table>'
 
         return table
@@ -3911,6 +4574,15 @@ class ClanLeague(Tournament):
         return ""
 
 
+# one rendered row of a clan league's game log, written when the game it shows changes
+class ClanLeagueGameLogRow(models.Model):
+    league = models.ForeignKey('ClanLeague', on_delete=models.CASCADE)
+    game = models.OneToOneField('TournamentGame', on_delete=models.CASCADE, related_name='clan_league_log_row')
+    version = models.CharField(max_length=255, default="")
+    is_finished = models.BooleanField(default=False)
+    row = models.TextField(default="")
+
+
 def get_real_time_ladder(ladderId):
     try:
         ladder = RealTimeLadder.objects.get(id=int(ladderId))
@@ -3918,6 +4590,13 @@ def get_real_time_ladder(ladderId):
     except ObjectDoesNotExist:
         return None
 
+def get_template_from_mask(templates_list, mask):
+    # uniformly pick one of the templates whose bit is set in the mask, None if no bits are set
+    allowed = [template for index, template in enumerate(templates_list) if mask & (1 << index)]
+    if len(allowed) == 0:
+        return None
+    return random.choice(allowed)
+
 class RealTimeLadder(Tournament):
     direct_seconds_per_turn = models.IntegerField(default=180, blank=True, null=True)
     auto_boot_seconds = models.IntegerField(default=180, blank=True, null=True)
@@ -3996,6 +4675,10 @@ class RealTimeLadder(Tournament):
             for t in top_teams:
                 top10.append(t.id)
 
+            # allowed templates per team are held as bitsets over templates_list, loaded once per pass
+            all_templates_mask = (1 << len(templates_list)) - 1
+            vetoed_templates = self.get_vetoed_template_masks(templates_list)
+
             teams_find_games_against = teams_find_games.copy()
             # loop through teams_find_games, trying to get a matchup of an opponent from
             # teams_find_games_against, popping off teams that are the same or teams
@@ -4014,21 +4697,18 @@ class RealTimeLadder(Tournament):
                                 raise ContinueOnError
                             
                             print("# of teams joined but not in a game: {}".format(len(teams_find_games)))
-                            tid = templates_list[random.randint(0, len(templates_list)-1)]
 
                             # TODO teams cannot play each other twice in 12 hours
                             game_data = "{}.{}".format(team1.id, team2.id)
 
                             if get_games_against_since_hours(team1, team2, self, 1) == 0:
-                                # before we create we need to check template vetoes
-                                # and loop until we're in a good spot
-                                # to minimize the work done here we will check if both teams are in the top 10
-                                # then if only one of them are
-                                while True:
-                                    if self.is_template_allowed(tid.template, team1) and self.is_template_allowed(tid.template, team2):
-                                        break
-                                    else:
-                                        tid = templates_list[random.randint(0, len(templates_list) - 1)]
+                                # before we create we need to check template vetoes, the templates both teams
+                                # allow are the AND of their bitsets
+                                allowed_mask = all_templates_mask & ~vetoed_templates[team1.id] & ~vetoed_templates[team2.id]
+                                tid = get_template_from_mask(templates_list, allowed_mask)
+                                if tid is None:
+                                    print("Teams {} and {} have no template in common, continue looking".format(team1.id, team2.id))
+                                    continue
 
                                 extra_settings = self.get_game_extra_settings()
                                 self.create_game_with_template_and_data(round, game_data, tid.template, extra_settings)
@@ -4137,6 +4817,19 @@ class RealTimeLadder(Tournament):
         except ObjectDoesNotExist:
             return "You haven't joined the ladder yet. You must join the ladder in order to veto a template."
 
+    def get_vetoed_template_masks(self, templates_list):
+        # returns a dict of team id -> bitset of vetoed templates, where bit i is templates_list[i]
+        # all vetoes on the ladder are loaded with a single query
+        template_bits = {}
+        for index, template in enumerate(templates_list):
+            template_bits[template.id] = 1 << index
+
+        vetoed_templates = defaultdict(int)
+        vetoes = RealTimeLadderVeto.objects.filter(ladder=self, template__in=list(template_bits)).values_list('team_id', 'template_id')
+        for team_id, template_id in vetoes:
+            vetoed_templates[team_id] |= template_bits[template_id]
+        return vetoed_templates
+
     def is_template_allowed(self, templateid, team):
         veto = RealTimeLadderVeto.objects.filter(team=team, ladder=self, template=int(templateid))
         if veto:
@@ -4180,13 +4873,14 @@ class RealTimeLadder(Tournament):
         games = TournamentGame.objects.filter(tournament=self, is_finished=False)
         if games:
             data = ""
+            # the players of every team on the ladder in one query
+            team_players = get_team_players(self)
             for game in games:
                 teams = game.teams
-                team1 = TournamentTeam.objects.filter(id=int(teams.split('.')[0]), tournament=self)
-                team2 = TournamentTeam.objects.filter(id=int(teams.split('.')[1]), tournament=self)
+                team1 = team_players[int(teams.split('.')[0])]
+                team2 = team_players[int(teams.split('.')[1])]
                 if team1 and team2:
-                    # lookup the players on the team
-                    data += "{} vs. {} | [Game Link]({})\n".format(get_team_data_no_clan(team1[0]), get_team_data_no_clan(team2[0]), game.game_link)
+                    data += "{} vs. {} | [Game Link]({})\n".format(get_players_data_no_clan(team1), get_players_data_no_clan(team2), game.game_link)
             return data
         else:
             return "There are no games in progress on the ladder."
@@ -4195,20 +4889,20 @@ class RealTimeLadder(Tournament):
         data = "__**Players currently joined**__\n"
         teams = TournamentTeam.objects.filter(tournament=self, active=True).order_by('-rating')
         if teams:
+            team_players = get_team_players(self, team__active=True)
             for team in teams:
-                data += "{} | {} {}-{} \n".format(team.rating, get_team_data_no_clan(team), team.wins, team.losses)
+                data += "{} | {} {}-{} \n".format(team.rating, get_players_data_no_clan(team_players[team.id]), team.wins, team.losses)
         else:
             data += "There are no players currently on the ladder."
         return data
 
     def get_current_rankings(self):
         data = "__**Ladder Rankings**__\n"
-        teams = TournamentTeam.objects.filter(tournament=self).order_by('-rating')
+        teams = list(TournamentTeam.objects.filter(tournament=self).order_by('-rating')[:10])
+        team_players = get_team_players(self, team__in=teams)
         current_rank = 1
         for team in teams:
-            if current_rank > 10:
-                break
-            data += "{}) {} | {}\n".format(current_rank, team.rating, get_team_data_no_clan(team))
+            data += "{}) {} | {}\n".format(current_rank, team.rating, get_players_data_no_clan(team_players[team.id]))
             current_rank += 1
         return data
 
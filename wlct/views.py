@@ -1,14 +1,17 @@
 from django.shortcuts import render
-from django.http import HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect, HttpResponseNotModified
 from wlct.form_message_handling import FormError
 from wlct.api import API, get_account_token
 from wlct.models import Player, Clan
-from wlct.tournaments import SwissTournament, GroupStageTournament, SeededTournament, TournamentInvite, TournamentPlayer, find_tournament_by_id, Tournament, find_league_by_id, is_player_allowed_join, TournamentGameEntry, get_player_data, get_team_data, ClanLeagueDivision, ClanLeagueDivisionClan, ClanLeague, ClanLeagueTournament, get_matchup_data
+from wlct.tournaments import SwissTournament, GroupStageTournament, SeededTournament, TournamentInvite, TournamentPlayer, find_tournament_by_id, Tournament, find_league_by_id, is_player_allowed_join, TournamentGameEntry, get_player_data, get_team_data, ClanLeagueDivision, ClanLeagueDivisionClan, ClanLeague, ClanLeagueTournament, get_matchup_data, get_players_data, get_player_game_summary, get_player_games_page, get_open_listing_key, get_open_tournaments, get_open_leagues, get_tournament_version, get_player_allowed_join
 from wlct.forms import SwissTournamentForm, SeededTournamentForm, GroupTournamentForm, MonthlyTemplateCircuitForm, PromotionRelegationLeagueForm, ClanLeagueForm
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import ensure_csrf_cookie
+from django.template.loader import render_to_string
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from wlct.logging import log, LogLevel, log_exception
+from wlct.events import event_broker
 import traceback
 from itertools import chain
 from django.conf import settings
@@ -21,6 +24,11 @@ from django_apscheduler.jobstores import DjangoJobStore
 from wlct.management.commands.engine import tournament_engine
 import string
 import random
+import hashlib
+import json
+import queue
+import time
+import weakref
 
 def schedule_jobs():
     # lookup the main scheduler, if it's not currently scheduled, add it every 5 min
@@ -183,6 +191,12 @@ def refresh_tournament(request):
     if request.method == 'POST':
         tournamentid = request.POST['tournamentid']
 
+        # the version covers everything on the page and who is looking at it, a client that already
+        # has it gets nothing back
+        version = "{}:{}".format(get_tournament_version(tournamentid), request.session.get('token', ''))
+        if request.POST.get('version') == version:
+            return HttpResponseNotModified()
+
         tournament = find_tournament_by_id(tournamentid, True)
         if tournament is not None:
             player = None
@@ -200,13 +214,20 @@ def refresh_tournament(request):
                         request.session['token']), LogLevel.warning)
                     return HttpResponseRedirect('/index/')
 
-            allowed_join = is_player_allowed_join(player, tournament[0].template)
-            context.update({'team_table': tournament[0].get_team_table(allowed_join, is_player_token_valid(request), player)})
+            allowed_join = get_player_allowed_join(player, tournament[0].template)
             context.update({'can_start_tourney': tournament[0].can_start_tourney})
-            context.update({'bracket_game_data': tournament[0].get_bracket_game_data()})
-            context.update({'game_log': tournament[0].get_game_log()})
-            # now grab the entire tournament log and invited players list and send that back over as well
             # this should already be properly formatted html, so just pass the strings back
+            # and only the ones that changed since the versions the client holds
+            fragments = {'team_table': tournament[0].get_team_table(allowed_join, is_player_token_valid(request), player),
+                         'bracket_game_data': tournament[0].get_bracket_game_data(),
+                         'game_log': tournament[0].get_game_log()}
+            fragment_versions = {}
+            for name, fragment in fragments.items():
+                fragment_versions[name] = hashlib.md5((fragment or "").encode('utf-8')).hexdigest()
+                if request.POST.get('fragment_versions[{}]'.format(name)) != fragment_versions[name]:
+                    context.update({name: fragment})
+            context.update({'version': version})
+            context.update({'fragment_versions': fragment_versions})
             context.update({'success': 'true'})
             ret = JsonResponse(context)
             return ret
@@ -558,6 +579,121 @@ def tournament_invite_players(request):
     return HttpResponseRedirect('/index/')
 
 
+def tournament_invite_search(request):
+    # returns one page of players matching the search text that can still be invited
+    context = {'success': 'false'}
+    if request.method == 'POST' and is_player_token_valid(request):
+        try:
+            tournament = find_tournament_by_id(request.POST['tournamentid'], True)
+            if tournament:
+                tournament = tournament[0]
+                invite_rows = tournament.get_invite_candidates_rows(tournament.created_by.token, request.POST, request.session['token'])
+                context.update({"invite_rows": invite_rows})
+                context.update({"success": "true"})
+                return JsonResponse(context)
+        except Exception as e:
+            log_exception()
+            context.update({"error": str(e)})
+            return JsonResponse(context)
+
+    return HttpResponseRedirect('/index/')
+
+
+def tournament_game_log(request):
+    # one page of the game log for the DataTables table on the league page
+    context = {'success': 'false'}
+    if request.method == 'POST':
+        try:
+            tournament = find_tournament_by_id(request.POST['tournamentid'], True)
+            if tournament and hasattr(tournament[0], 'get_game_log_page'):
+                context.update(tournament[0].get_game_log_page(request.POST))
+                context.update({"success": "true"})
+                return JsonResponse(context)
+        except Exception as e:
+            log_exception()
+            context.update({"error": str(e)})
+            return JsonResponse(context)
+
+    return HttpResponseRedirect('/index/')
+
+
+def tournament_crosstable(request):
+    # the round robin crosstable as data, for pages that draw it themselves
+    context = {'success': 'false'}
+    if request.method == 'POST':
+        try:
+            tournament = find_tournament_by_id(request.POST['tournamentid'], True)
+            if tournament and hasattr(tournament[0], 'get_crosstable_data'):
+                context.update({"crosstable": tournament[0].get_crosstable_data()})
+                context.update({"success": "true"})
+                return JsonResponse(context)
+        except Exception as e:
+            log_exception()
+            context.update({"error": str(e)})
+            return JsonResponse(context)
+
+    return HttpResponseRedirect('/index/')
+
+
+def tournament_bracket(request, id):
+    # the seeded bracket as json straight from the tournament row, tagged with its version so a page
+    # that already drew it gets a 304
+    try:
+        bracket = SeededTournament.objects.filter(pk=id).values('bracket_game_data', 'bracket_version').first()
+        if bracket is None:
+            return JsonResponse({'success': 'false', 'error': "Tournament {} is not a seeded tournament".format(id)}, status=404)
+
+        if not bracket['bracket_game_data']:
+            # the engine hasn't built it yet
+            tournament = SeededTournament.objects.get(pk=id)
+            tournament.update_bracket_game_data()
+            tournament.save(update_fields=['bracket_game_data', 'bracket_version'])
+            bracket = {'bracket_game_data': tournament.bracket_game_data, 'bracket_version': tournament.bracket_version}
+
+        etag = '"{}"'.format(bracket['bracket_version'])
+        if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(bracket['bracket_game_data'], content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
+    except Exception as e:
+        log_exception()
+        return JsonResponse({'success': 'false', 'error': str(e)}, status=500)
+
+
+def tournament_events(request, id):
+    # a stream of server-sent events for one tournament. nothing here touches the database, but an open
+    # stream holds a thread waiting on its queue, so only so many are served and the rest of the pages poll
+    subscriber = event_broker.subscribe(id)
+    if subscriber is None:
+        response = HttpResponse(status=503)
+        response['Retry-After'] = '60'
+        return response
+
+    def stream():
+        try:
+            yield "retry: 10000\n\n"
+            closes_at = time.monotonic() + settings.EVENT_STREAM_TIMEOUT
+            while time.monotonic() < closes_at:
+                try:
+                    message = subscriber.get(timeout=15)
+                    yield "event: {}\ndata: {}\n\n".format(message['event'], json.dumps(message['data']))
+                except queue.Empty:
+                    # comments keep proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+        finally:
+            event_broker.unsubscribe(id, subscriber)
+
+    events = stream()
+    # a stream that is closed before it was ever read never reaches its finally, give the slot back when it's freed
+    weakref.finalize(events, event_broker.unsubscribe, id, subscriber)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
 def tournament_player_status_change(request):
 
     context = {}
@@ -728,35 +864,69 @@ def settings_view(request):
     else:
         return index(request)
 
+def get_mygames_link(status, tournament_id, after=None):
+    params = []
+    if status is not None:
+        params.append("status={}".format(status))
+    if tournament_id is not None:
+        params.append("tournament={}".format(tournament_id))
+    if after is not None:
+        params.append("after={}".format(after))
+    return "/games/?{}".format("&".join(params))
+
+
 @ensure_csrf_cookie
 def mygames_view(request):
     context = {}
-    # data table for all the games I am in
+    # data table for all the games I am in, a page at a time
 
-    game_data_table = '<div class="row"><div class="container"><table class="table table-bordered table-condensed clot_table" id="game_log_data_table">'
-    game_data_table += '<thead><tr><th>Tournament</th><th>Game</th><th>Game Link</th><th>Outcome</th></tr></thead><tbody>'
     if is_player_token_valid(request):
         # valid token, get all the players games
         try:
             player = Player.objects.get(token=request.session['token'])
 
-            tournament_players = TournamentPlayer.objects.filter(player=player)
-            for tournament_player in tournament_players:
-                game_entries = TournamentGameEntry.objects.filter(team=tournament_player.team)
-                for game_entry in game_entries:
-                    if game_entry.game.is_finished and game_entry.game.winning_team == tournament_player.team:
-                        outcome = '<span class="label label-success">You Won</span>'
-                    elif game_entry.game.is_finished:
-                        outcome = '<span class="label label-danger">You Lost. Get Better.</span>'
-                    else:
-                        outcome = '<span class="label label-primary">In Progress</span>'
-                    game_data_table += '<tr>'
-                    game_data_table += '<td>{}</td>'.format(game_entry.tournament.name)
-                    game_data_table += '<td>{}</td>'.format(get_matchup_data(game_entry.team, game_entry.team_opp))
-                    game_data_table += '<td><a href="{}" target="_blank">Game Link</a></td>'.format(game_entry.game.game_link)
-                    game_data_table += '<td>{}</td>'.format(outcome)
-
-            game_data_table += '</tbody></table></div></div>'
+            status = request.GET.get('status')
+            if status not in ["in_progress", "won", "lost"]:
+                status = None
+            tournament_id = request.GET.get('tournament', '')
+            tournament_id = int(tournament_id) if tournament_id.isnumeric() else None
+            after = request.GET.get('after', '')
+            after = int(after) if after.isnumeric() else None
+
+            summary = get_player_game_summary(player, tournament_id)
+            filters = [(None, "All", summary['total']), ("in_progress", "In Progress", summary['in_progress']), ("won", "Won", summary['won']), ("lost", "Lost", summary['lost'])]
+            game_data_table = '<div class="row"><div class="container"><p>'
+            for filter_status, filter_name, filter_count in filters:
+                button_class = "btn-info" if filter_status == status else "btn-outline-info"
+                game_data_table += '<a class="btn btn-sm {}" href="{}">{} ({})</a>&nbsp;'.format(button_class, get_mygames_link(filter_status, tournament_id), filter_name, filter_count)
+            if tournament_id is not None:
+                game_data_table += '<a class="btn btn-sm btn-outline-secondary" href="{}">All Tournaments</a>'.format(get_mygames_link(status, None))
+            game_data_table += '</p>'
+
+            entries, team_players, has_more = get_player_games_page(player, status, tournament_id, after)
+            game_data_table += '<table class="table table-bordered table-condensed clot_table" id="game_log_data_table">'
+            game_data_table += '<thead><tr><th>Tournament</th><th>Game</th><th>Game Link</th><th>Outcome</th></tr></thead><tbody>'
+            for game_entry in entries:
+                if game_entry.game.is_finished and game_entry.game.winning_team_id == game_entry.team_id:
+                    outcome = '<span class="label label-success">You Won</span>'
+                elif game_entry.game.is_finished:
+                    outcome = '<span class="label label-danger">You Lost. Get Better.</span>'
+                else:
+                    outcome = '<span class="label label-primary">In Progress</span>'
+                tournament_name = ""
+                if game_entry.tournament is not None:
+                    tournament_name = '<a href="{}">{}</a>'.format(get_mygames_link(status, game_entry.tournament_id), game_entry.tournament.name)
+                game_data_table += '<tr>'
+                game_data_table += '<td>{}</td>'.format(tournament_name)
+                game_data_table += '<td><table><tr><td>{}</td><td>{}</td></tr></table></td>'.format(get_players_data(team_players[game_entry.team_id], False), get_players_data(team_players[game_entry.team_opp_id], False))
+                game_data_table += '<td><a href="{}" target="_blank">Game Link</a></td>'.format(game_entry.game.game_link)
+                game_data_table += '<td>{}</td>'.format(outcome)
+                game_data_table += '</tr>'
+
+            game_data_table += '</tbody></table>'
+            if has_more:
+                game_data_table += '<a class="btn btn-info" href="{}">Older Games</a>'.format(get_mygames_link(status, tournament_id, entries[-1].id))
+            game_data_table += '</div></div>'
             context.update({'my_games': game_data_table})
             return render(request, 'games.html', context)
         except ObjectDoesNotExist:
@@ -772,32 +942,21 @@ def mygames_view(request):
 @ensure_csrf_cookie
 def index(request):
     context = {}
-    try:
+    # anonymous visitors get no session at all, the login link reads the account token from the context
+    if "token" in request.session:
         request.session.set_expiry(0)
         request.session['account_token'] = get_account_token()
+    context.update({'account_token': get_account_token()})
 
-        result_list = []
-        tournaments = Tournament.objects.filter(private=False, is_finished=False, has_started=False).order_by("-created_date")
-        for tournament in tournaments:
-            child_tournament = find_tournament_by_id(tournament.id)
-            if child_tournament:
-                result_list.append(child_tournament[0])
-
-        league_list = []
-        leagues = Tournament.objects.filter(private=False, is_finished=False, is_league=True).order_by("-is_official", "-created_date")
-        for league in leagues:
-            child_league = find_league_by_id(league.id)
-            if child_league:
-                league_list.append(child_league[0])
-
-        context.update({'leagues': league_list})
-        context.update({'tournaments': result_list})
-
-        return render(request, 'mytourneys.html', context)
-    except ObjectDoesNotExist:
-        log("No open tournaments", LogLevel.informational)
+    # the listing is the same for everyone, so it is rendered once and kept until a tournament is created,
+    # started or finished. the short timeout picks up players joining
+    listing = cache.get(get_open_listing_key())
+    if listing is None:
+        listing = render_to_string('listing.html', {'tournaments': get_open_tournaments(), 'leagues': get_open_leagues()})
+        cache.set(get_open_listing_key(), listing, 60)
+    context.update({'listing': listing})
 
-        return render(request, 'mytourneys.html', context)
+    return render(request, 'mytourneys.html', context)
 
 
 # The main Login View of the site
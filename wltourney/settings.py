@@ -51,6 +51,7 @@ MIDDLEWARE = (
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'wlct.middleware.TournamentVersionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware'
@@ -87,6 +88,60 @@ DATABASES['default'] = dj_database_url.config(conn_max_age=0)  # we pool connect
 # Enable Connection Pooling (if desired)
 DATABASES['default']['ENGINE'] = 'django_postgrespool'
 
+# live events listen on their own connection, which can't go through pgbouncer when it pools by transaction
+EVENTS_DATABASE_URL = os.environ.get('EVENTS_DATABASE_URL', '')
+
+# the pgbouncer buildpack sets DATABASE_URL_PGBOUNCER and bin/start-pgbouncer points DATABASE_URL at it. it pools
+# by transaction unless PGBOUNCER_POOL_MODE says otherwise
+DATABASE_BEHIND_PGBOUNCER = 'DATABASE_URL_PGBOUNCER' in os.environ and os.environ.get('PGBOUNCER_POOL_MODE', 'transaction') != 'session'
+
+# every open event stream holds one of the web process's threads, past this many pages poll instead. a stream is
+# closed after EVENT_STREAM_TIMEOUT seconds and the browser reconnects, so a forgotten tab doesn't keep its thread
+EVENT_STREAMS_MAX = int(os.environ.get('EVENT_STREAMS_MAX', 20))
+EVENT_STREAM_TIMEOUT = int(os.environ.get('EVENT_STREAM_TIMEOUT', 600))
+
+# the discord bot runs its queries on this many threads, which is also the most connections it holds at once
+BOT_DB_THREADS = int(os.environ.get('BOT_DB_THREADS', 4))
+
+# Cache
+# rendered html fragments are shared between the web, clock and worker processes. in production they live in redis
+# (the heroku redis addon sets REDIS_URL, give it the allkeys-lru policy so a full cache drops its oldest fragments),
+# where a write is one command. without it they go to a table in the database, where django counts the whole table on
+# every write and culls a third of it once it's full, which is only good enough for a test server
+if os.environ.get('REDIS_URL'):
+    DEFAULT_CACHE = {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+        },
+    }
+else:
+    DEFAULT_CACHE = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'wlct_cache',
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+        },
+    }
+
+CACHES = {
+    'default': DEFAULT_CACHE,
+    # tournament versions are kept apart from the fragments so nothing filling up the fragments can evict or cull
+    # them. there is one row per tournament, so counting the table on a write stays cheap and it never gets near
+    # MAX_ENTRIES
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'wlct_versions',
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000000,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/1.9/ref/settings/#auth-password-validators
 
@@ -116,16 +116,9 @@ function hook_invite_players()
                {
                     $("#invitetab").html(data.invited_players);
 
-                    // now create a filter on the table to hide/show rows based on the filter text
+                    // only the first page of players comes down, the rest are searched for on the server
                     $("#tournament_invites_text").html(data.invited_players_inverse);
 
-                    $("#invite-filter").on("keyup", function() {
-                        var value = $(this).val().toLowerCase();
-                        $("#invite-filter-table tr").filter(function() {
-                            $(this).toggle($(this).text().toLowerCase().indexOf(value) > -1)
-                        });
-                    });
-
                     $("#cl-update-player").data(thisVar.data());
                }
             },
@@ -146,6 +139,158 @@ function hook_invite_players()
     });
 }
 
+var invite_search_timer = null;
+var refresh_versions = {'version' : '', 'fragments' : {}};
+
+function search_invite_players(after_name, after_id)
+{
+    var tournamentid = $("#tournamentid").val();
+    var search_data = {'tournamentid' : tournamentid, 'q' : $("#invite-filter").val()};
+    if ($("#cl-player-id").length)
+    {
+        search_data['data_attrib[player]'] = $("#cl-player-id").val();
+    }
+    if (after_id !== undefined)
+    {
+        search_data['after_name'] = after_name;
+        search_data['after_id'] = after_id;
+    }
+
+    $.ajax({
+        type:"POST",
+        url:"/tournaments/invite_players/search/",
+        headers: {'X-CSRFToken': Cookies.get('csrftoken')},
+        data: search_data,
+        success: function(data)
+        {
+           if (data.success == "true")
+           {
+                if (after_id !== undefined)
+                {
+                    // next page, replace the more button with the new rows
+                    $("#invite-search-more-row").replaceWith(data.invite_rows);
+                }
+                else
+                {
+                    $("#invite-filter-table").html(data.invite_rows);
+                }
+           }
+        }
+    });
+}
+
+function hook_invite_search()
+{
+    // wait for the creator to stop typing before searching
+    $(document).on('keyup', '#invite-filter', function() {
+        clearTimeout(invite_search_timer);
+        invite_search_timer = setTimeout(function() {
+            search_invite_players();
+        }, 250);
+    });
+
+    $(document).on('click', '#invite-search-more', function() {
+        var thisVar = jQuery(this);
+        thisVar.prop('disabled', true);
+        thisVar.html('<i class="fa fa-spinner fa-spin"></i>');
+        search_invite_players(thisVar.attr('data-after-name'), thisVar.attr('data-after-id'));
+    });
+}
+
+function hook_game_log_table()
+{
+    var table = $('#game_log_data_table');
+    if (!table.data('url'))
+    {
+        table.DataTable();
+        return;
+    }
+
+    // rows come from the server a page at a time, remember the last game of every page we have seen
+    // so the next page continues from there
+    var page_cursors = {};
+    var last_query = "";
+    table.DataTable({
+        serverSide: true,
+        processing: true,
+        searchDelay: 250,
+        pageLength: table.data('page-length'),
+        order: [[0, 'desc']],
+        columns: [{orderable: true}, {orderable: false}, {orderable: false}],
+        ajax: function(data, callback, settings)
+        {
+            var query = data.order[0].dir + ":" + data.search.value + ":" + data.length;
+            if (query != last_query)
+            {
+                page_cursors = {};
+                last_query = query;
+            }
+
+            var log_data = {'tournamentid' : table.data('tournament'), 'draw' : data.draw, 'start' : data.start, 'length' : data.length, 'search' : data.search.value, 'order' : data.order[0].dir};
+            if (page_cursors[data.start] !== undefined)
+            {
+                log_data['after'] = page_cursors[data.start];
+            }
+
+            $.ajax({
+                type:"POST",
+                url:table.data('url'),
+                headers: {'X-CSRFToken': Cookies.get('csrftoken')},
+                data: log_data,
+                success: function(log)
+                {
+                    if (log.success == "true")
+                    {
+                        if (log.last_id !== null)
+                        {
+                            page_cursors[data.start + data.length] = log.last_id;
+                        }
+                        callback(log);
+                    }
+                }
+            });
+        }
+    });
+}
+
+var tournament_event_timer = null;
+var tournament_events = null;
+function hook_tournament_events()
+{
+    // refresh the page when the engine reports something happened in the tournament instead of waiting for a click
+    // one stream per page, however many times the bindings are set up again
+    var tournamentid = $("#tournamentid").val();
+    if (tournament_events || !tournamentid || typeof(EventSource) === "undefined")
+    {
+        return;
+    }
+
+    var events = new EventSource("/tournaments/" + tournamentid + "/events/");
+    tournament_events = events;
+    var refresh = function()
+    {
+        // a pass of the engine sends a burst of events, refresh once when it settles
+        clearTimeout(tournament_event_timer);
+        tournament_event_timer = setTimeout(function() {
+            $("#refresh_tournament").trigger('click');
+        }, 1000);
+    };
+    ["tournament_updated", "game_created", "game_finished", "round_advanced"].forEach(function(event_name) {
+        events.addEventListener(event_name, refresh);
+    });
+    events.onerror = function()
+    {
+        // the server turns streams away when it's serving too many, check for changes once a minute instead.
+        // a refresh with nothing new is answered with a 304
+        if (events.readyState == EventSource.CLOSED)
+        {
+            setInterval(function() {
+                $("#refresh_tournament").trigger('click');
+            }, 60000);
+        }
+    };
+}
+
 function hook_clan_league_buttons()
 {
     $("button[id^=division-remove").on('click', function()
@@ -297,47 +442,46 @@ function update_division(type, obj)
         });
 }
 
+function draw_seeded_bracket(json_data)
+{
+    $("div#bracket_seeded_async").attr('data-bracket', JSON.stringify(json_data.bracket_data));
+    $("div#bracket_seeded_async").attr('data-game-links', JSON.stringify(json_data.game_links));
+
+    // we have async bracket data, draw the seeded tournament
+    var bracket_data = $('div#bracket_seeded_async').attr('data-bracket');
+    try
+    {
+        bracket_data = JSON.parse(bracket_data);
+    }
+    catch (e)
+    {
+        console.log(e);
+    }
+
+    $("#games-tab").off("click.bracket").on("click.bracket", function()
+    {
+       setTimeout(function () {
+           $('div#bracket_seeded_async').bracket({
+               init: bracket_data /* data to initialize the bracket with */,
+               skipConsolationRound : true,
+               centerConnectors: true,
+               teamWidth: 150,
+               onMatchClick: onclick_seeded_match});
+       }, 100);
+    });
+}
+
 function refresh_tournament_async()
 {
+    // the bracket has its own endpoint, the browser revalidates it and only downloads a changed bracket
     var tournamentid = $("#tournamentid").val();
-    var templateid = $("#templateid").val();
     $.ajax({
-        type:"POST",
-        url:"/tournaments/refresh/",
-        headers: {'X-CSRFToken': Cookies.get('csrftoken')},
-        data: {'tournamentid' : tournamentid, 'templateid' : templateid},
+        type:"GET",
+        url:"/tournaments/" + tournamentid + "/bracket/",
+        dataType: "json",
         success: function(data)
         {
-            if (data.success == "true")
-            {
-                json_data = JSON.parse(data.bracket_game_data);
-
-                $("div#bracket_seeded_async").attr('data-bracket', JSON.stringify(json_data.bracket_data));
-                $("div#bracket_seeded_async").attr('data-game-links', JSON.stringify(json_data.game_links));
-
-                // we have async bracket data, draw the seeded tournament
-                var bracket_data = $('div#bracket_seeded_async').attr('data-bracket');
-                try
-                {
-                    bracket_data = JSON.parse(bracket_data);
-                }
-                catch (e)
-                {
-                    console.log(e);
-                }
-
-                $("#games-tab").click(function()
-                {
-                   setTimeout(function () {
-                       $('div#bracket_seeded_async').bracket({
-                           init: bracket_data /* data to initialize the bracket with */,
-                           skipConsolationRound : true,
-                           centerConnectors: true,
-                           teamWidth: 150,
-                           onMatchClick: onclick_seeded_match});
-                   }, 100);
-                });
-            }
+            draw_seeded_bracket(data);
         }
     });
 }
@@ -405,6 +549,7 @@ $(function () {
 
     hook_clan_league_buttons();
     hook_invite_players();
+    hook_invite_search();
 
     $("#create-division").on('click', function ()
     {
@@ -545,21 +690,35 @@ $(function () {
                 type:"POST",
                 url:"/tournaments/refresh/",
                 headers: {'X-CSRFToken': Cookies.get('csrftoken')},
-                data: {'tournamentid' : tournamentid, 'templateid' : templateid},
-                success: function(data)
+                data: {'tournamentid' : tournamentid, 'templateid' : templateid, 'version' : refresh_versions.version, 'fragment_versions' : refresh_versions.fragments},
+                success: function(data, textStatus, jqXHR)
                 {
+                   if (jqXHR.status == 304)
+                   {
+                      // nothing changed since the last refresh
+                      return;
+                   }
                    if (data.success == "true")
                    {
-                      // update the table, which should have been returned to us
-                      $("#lobbytab").html(data.team_table);
-
-                      if ($("div#bracket_seeded_async").length)
+                      // only the parts that changed are sent back
+                      if (data.team_table !== undefined)
                       {
-                        refresh_tournament_async();
+                        $("#lobbytab").html(data.team_table);
                       }
-                      else
+
+                      if (data.bracket_game_data !== undefined)
                       {
-                        $("#gamestab").html(data.bracket_game_data);
+                        if ($("div#bracket_seeded_async").length)
+                        {
+                          if (data.bracket_game_data)
+                          {
+                            draw_seeded_bracket(JSON.parse(data.bracket_game_data));
+                          }
+                        }
+                        else
+                        {
+                          $("#gamestab").html(data.bracket_game_data);
+                        }
                       }
 
                       if (data.can_start_tourney)
@@ -572,18 +731,23 @@ $(function () {
                             $("#start_tournament").prop('disabled', true);
                       }
 
-                      if ($("div#gamelogtab").length)
+                      // the first refresh happens as the page loads and sends back the log the page was rendered
+                      // with, the ready handler has already hooked that one
+                      if ($("div#gamelogtab").length && refresh_versions.version)
                       {
                           if (data.game_log)
                           {
                                $("#gamelogtab").html(data.game_log);
-                               $('#game_log_data_table').DataTable();
+                               hook_game_log_table();
 
                                $('.time_to_boot').each(function () {
                                     handle_game_countdown(jQuery(this));
                                });
                           }
                       }
+
+                      refresh_versions.version = data.version;
+                      refresh_versions.fragments = data.fragment_versions;
                    }
                    else
                    {
@@ -793,7 +957,7 @@ $(function () {
             type:"POST",
             url:"/tournaments/invite_players/",
             headers: {'X-CSRFToken': Cookies.get('csrftoken')},
-            data: {'tournamentid' : tournamentid, 'buttonid': id},
+            data: {'tournamentid' : tournamentid, 'buttonid': id, 'q': $("#invite-filter").val()},
             success: function(data)
             {
                if (data.success == "true")
@@ -1111,6 +1275,13 @@ $(function () {
         refresh_tournament_async();
     }
 
+    // the game log table is hooked once here and again whenever a later refresh replaces it, the pause and
+    // resume buttons rebind themselves without touching it
+    hook_game_log_table();
+    $('.time_to_boot').each(function () {
+        handle_game_countdown(jQuery(this));
+    });
+    hook_tournament_events();
     update_pause_resume_bindings();
 });
 
@@ -1227,7 +1398,6 @@ function update_pause_resume_bindings()
     });
 
     $("#refresh_tournament").trigger('click');
-    $('#game_log_data_table').DataTable();
 }
 
 function toggle_div(divId)
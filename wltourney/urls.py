@@ -4,6 +4,7 @@ from django.contrib.auth import views as auth_views
 admin.autodiscover()
 import debug_toolbar
 import wlct.views
+import wlct.api_v1
 
 # Examples:
 # url(r'^$', 'wltourney.views.home', name='home'),
@@ -33,11 +34,16 @@ urlpatterns = [
     path('tournaments/template_check/', wlct.views.template_check_view, name='template_check_view'),
     path('tournaments/me/', wlct.views.mytourneys_view, name='mytourneys_view'),
     path('tournaments/<int:id>/', wlct.views.tournament_display_view, name='tournament_display_view'),
+    path('tournaments/<int:id>/events/', wlct.views.tournament_events, name='tournament_events'),
+    path('tournaments/<int:id>/bracket/', wlct.views.tournament_bracket, name='tournament_bracket'),
     path('tournaments/start/', wlct.views.tournament_start, name='tournament_start'),
     path('tournaments/start_request/', wlct.views.tournament_start_request, name='tournament_start_request'),
     path('tournaments/cancel_request/', wlct.views.tournament_cancel_request, name='tournament_cancel_request'),
     path('tournaments/delete/', wlct.views.tournament_delete, name='tournament_delete'),
     path('tournaments/invite_players/', wlct.views.tournament_invite_players, name='tournament_invite_players'),
+    path('tournaments/invite_players/search/', wlct.views.tournament_invite_search, name='tournament_invite_search'),
+    path('tournaments/game_log/', wlct.views.tournament_game_log, name='tournament_game_log'),
+    path('tournaments/crosstable/', wlct.views.tournament_crosstable, name='tournament_crosstable'),
 
     # league related URLs
     path('leagues/create/', wlct.views.create_new_league_view, name='create_new_league_view'),
@@ -51,5 +57,15 @@ urlpatterns = [
     path('cl/templates/update/', wlct.views.cl_update_templates, name='cl_update_templates'),
     path('cl/templates/start/', wlct.views.cl_start_template, name='cl_start_template'),
 
-    path('max_games_at_once/', wlct.views.update_max_games_at_once, name='update_max_games_at_once')
+    path('max_games_at_once/', wlct.views.update_max_games_at_once, name='update_max_games_at_once'),
+
+    # read-only json api
+    path('api/v1/tournaments/', wlct.api_v1.tournaments, name='api_v1_tournaments'),
+    path('api/v1/tournaments/<int:id>/', wlct.api_v1.tournament, name='api_v1_tournament'),
+    path('api/v1/tournaments/<int:id>/rounds/', wlct.api_v1.tournament_rounds, name='api_v1_tournament_rounds'),
+    path('api/v1/tournaments/<int:id>/games/', wlct.api_v1.tournament_games, name='api_v1_tournament_games'),
+    path('api/v1/tournaments/<int:id>/teams/', wlct.api_v1.tournament_teams, name='api_v1_tournament_teams'),
+    path('api/v1/tournaments/<int:id>/standings/', wlct.api_v1.tournament_standings, name='api_v1_tournament_standings'),
+    path('api/v1/ladders/<int:id>/rankings/', wlct.api_v1.ladder_rankings, name='api_v1_ladder_rankings'),
+    path('api/v1/players/<str:token>/games/', wlct.api_v1.player_games, name='api_v1_player_games'),
 ]